@@ -0,0 +1,44 @@
+import asyncio
+import weakref
+import aiohttp
+
+# Upper bound on open Edge-TTS sockets per event loop
+EDGE_CONNECTION_LIMIT = 32
+
+
+class _PooledConnector(aiohttp.TCPConnector):
+    """TCP connector shared by every edge_tts.Communicate on one event loop.
+
+    edge_tts opens (and closes) a ClientSession per request, which would also
+    close the connector; ignoring that keeps the DNS cache and idle sockets
+    warm for the next name. Call release_edge_connector() to tear it down.
+    """
+
+    async def close(self):
+        pass
+
+    async def shutdown(self):
+        await super().close()
+
+
+_EDGE_CONNECTORS = weakref.WeakKeyDictionary()
+
+
+def get_edge_connector():
+    """Return the pooled Edge-TTS connector for the running event loop."""
+    loop = asyncio.get_running_loop()
+    connector = _EDGE_CONNECTORS.get(loop)
+    if connector is None:
+        connector = _PooledConnector(limit=EDGE_CONNECTION_LIMIT, ttl_dns_cache=300, keepalive_timeout=60)
+        _EDGE_CONNECTORS[loop] = connector
+    return connector
+
+
+async def release_edge_connector():
+    """Close the pooled Edge-TTS connector of the running event loop, if any.
+
+    Call it once, when the loop that synthesizes all the names is done.
+    """
+    connector = _EDGE_CONNECTORS.pop(asyncio.get_running_loop(), None)
+    if connector is not None:
+        await connector.shutdown()
@@ -0,0 +1,16 @@
+"""
+File helpers shared by the generation pipelines in this folder
+"""
+
+import os
+import shutil
+
+def link_or_copy(src: str, dst: str):
+    """Place src at dst without re-encoding: hardlink if possible, else a kernel-side copy."""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Cross-device or unsupported filesystem
+        shutil.copyfile(src, dst)
@@ -9,8 +9,11 @@ import ssl
 import aiohttp
 from generate_video import generate_video_for_name
 from word_trimming import trim_audio_by_word, transcribe_audio
+from file_utils import link_or_copy
 import edge_tts
 import shutil
+import tempfile
+from functools import lru_cache
 
 # Disable SSL verification globally for edge_tts
 ssl._create_default_https_context = ssl._create_unverified_context
@@ -53,13 +56,18 @@ def safe_delete(path: str):
         print(f"⚠ Could not delete {path}: {e}")
 
 
+# Scratch space for intermediate WAVs: RAM-backed /dev/shm where available
+TEMP_AUDIO_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
 def extract_reference_audio(video_path: str, output_wav_path: str):
     """
     Extracts audio from base video and converts it to WAV format (24kHz mono PCM).
     Normalizes first to 44.1kHz stereo to standardize quality.
     """
+    fd, temp_normalized = tempfile.mkstemp(prefix=f"normalized_{RUN_ID}_", suffix=".wav", dir=TEMP_AUDIO_DIR)
+    os.close(fd)
     try:
-        temp_normalized = f"temp_normalized_audio_{RUN_ID}.wav"
         subprocess.run([
             "ffmpeg", "-y",
             "-i", video_path,
@@ -78,10 +86,11 @@ def extract_reference_audio(video_path: str, output_wav_path: str):
             output_wav_path
         ], check=True)
 
-        safe_delete(temp_normalized)
         print(f"✅ Reference voice extracted: {output_wav_path}")
     except subprocess.CalledProcessError as e:
         print(f"❌ Failed to extract reference voice: {e}")
+    finally:
+        safe_delete(temp_normalized)
 
 async def generate_tts(text: str, file_path: str, voice_gender="male"):
     """Generate speech using existing voice samples and text manipulation"""
@@ -300,8 +309,7 @@ def clone_voice(tts_wav_path: str, cloned_wav_path: str, reference_wav_path: str
         # Final fallback: copy the TTS file as cloned output
         print(f"🔄 Using TTS output as final fallback...")
         try:
-            import shutil
-            shutil.copy2(tts_wav_path, cloned_wav_path)
+            link_or_copy(tts_wav_path, cloned_wav_path)
             print(f"✅ Fallback cloned voice saved: {cloned_wav_path}")
         except Exception as fallback_e:
             print(f"❌ Fallback also failed: {fallback_e}")
@@ -538,8 +546,7 @@ def basic_voice_cloning_fallback(tts_wav_path: str, reference_wav_path: str, out
     except Exception as e:
         print(f"❌ Basic voice cloning fallback failed: {e}")
         # Final fallback: copy TTS file
-        import shutil
-        shutil.copy2(tts_wav_path, output_path)
+        link_or_copy(tts_wav_path, output_path)
         print(f"🔄 Copied TTS file as final fallback: {output_path}")
 
 def analyze_acoustic_environment(audio_path: str):
@@ -671,7 +678,7 @@ async def generate_progress(name: str, basevideo: str):
     create_name_audio_from_reference(name, reference_wav_path, tts_mp3)
 
     print(f"🔄 Converting MP3 to WAV for {name}")
-    os.system(f"ffmpeg -y -i \"{tts_mp3}\" \"{tts_wav}\"")
+    subprocess.run(["ffmpeg", "-y", "-i", tts_mp3, tts_wav], check=True, capture_output=True)
 
     print(f"🧬 Cloning voice for {name}")
     clone_voice(tts_wav, cloned_wav, reference_wav_path)
@@ -749,9 +756,6 @@ def create_tts_from_voice_sample(text: str, reference_voice_path: str, output_pa
         # This is a placeholder - in a real implementation, you'd use more sophisticated TTS
         
         # Method 1: Repeat and trim the reference voice to match estimated duration
-        temp_extended = f"temp_extended_{uuid.uuid4().hex[:6]}.wav"
-        temp_trimmed = f"temp_trimmed_{uuid.uuid4().hex[:6]}.wav"
-        
         try:
             # First convert to WAV if it's MP3
             ref_wav = reference_voice_path
@@ -769,23 +773,16 @@ def create_tts_from_voice_sample(text: str, reference_voice_path: str, output_pa
             
             original_duration = float(result.stdout.strip())
             
-            # If we need longer audio, loop the reference voice
+            # If we need longer audio, loop the reference voice at the demuxer
+            # so the filter graph stays the same size regardless of loop count
+            loop_args = []
             if estimated_duration > original_duration:
                 loops = int(estimated_duration / original_duration) + 1
-                # Create a list of inputs for concatenation
-                filter_inputs = " ".join([f"[0:a]" for _ in range(loops)])
-                subprocess.run([
-                    'ffmpeg', '-y', '-i', ref_wav,
-                    '-filter_complex', f'{filter_inputs} concat=n={loops}:v=0:a=1[out]',
-                    '-map', '[out]', temp_extended
-                ], check=True, capture_output=True)
-            else:
-                # Use the original if it's long enough
-                temp_extended = ref_wav
+                loop_args = ['-stream_loop', str(loops - 1)]
             
-            # Trim to the desired duration and convert to MP3
+            # Loop, trim to the desired duration and convert to MP3 in one pass
             subprocess.run([
-                'ffmpeg', '-y', '-i', temp_extended,
+                'ffmpeg', '-y', *loop_args, '-i', ref_wav,
                 '-t', str(estimated_duration),
                 '-acodec', 'mp3', output_path
             ], check=True, capture_output=True)
@@ -794,9 +791,6 @@ def create_tts_from_voice_sample(text: str, reference_voice_path: str, output_pa
             
         finally:
             # Cleanup temporary files
-            for temp_file in [temp_extended, temp_trimmed]:
-                if temp_file != ref_wav and os.path.exists(temp_file):
-                    safe_delete(temp_file)
             if ref_wav != reference_voice_path and os.path.exists(ref_wav):
                 safe_delete(ref_wav)
                 
@@ -940,6 +934,23 @@ def create_synthetic_name_audio(name: str, output_path: str):
         except:
             print("❌ Even fallback silence creation failed")
 
+def _enhancement_filter(audio_path: str, highpass: int, lowpass: int, volume: float, equalizer: str = None):
+    """Build an -af chain for name audio, skipping stages that cannot change it"""
+    filters = [f'highpass=f={highpass}']
+    try:
+        sample_rate, _, duration = _probe_stream_info(audio_path, os.path.getmtime(audio_path))
+    except Exception:
+        sample_rate, duration = None, None
+    
+    # A lowpass at or above Nyquist is a no-op
+    if sample_rate is None or sample_rate > 2 * lowpass:
+        filters.append(f'lowpass=f={lowpass}')
+    # EQ is inaudible on sub-second clips
+    if equalizer and (duration is None or duration >= 1.0):
+        filters.append(equalizer)
+    filters.append(f'volume={volume}')
+    return ','.join(filters)
+
 def create_name_audio_from_reference(name: str, reference_voice_path: str, output_path: str):
     """
     Create audio that attempts to say the name using available voice samples and TTS.
@@ -955,7 +966,7 @@ def create_name_audio_from_reference(name: str, reference_voice_path: str, outpu
             # Convert to MP3 and apply enhancement
             subprocess.run([
                 'ffmpeg', '-y', '-i', sample_path,
-                '-af', 'highpass=f=100,lowpass=f=6000,volume=1.1',
+                '-af', _enhancement_filter(sample_path, 100, 6000, 1.1),
                 '-acodec', 'mp3', output_path
             ], capture_output=True, check=True)
             print(f"✅ Pre-recorded sample enhanced: {output_path}")
@@ -979,7 +990,8 @@ def create_name_audio_from_reference(name: str, reference_voice_path: str, outpu
                 # Process the TTS to make it sound more natural
                 subprocess.run([
                     'ffmpeg', '-y', '-i', temp_wav,
-                    '-af', 'highpass=f=80,lowpass=f=6000,equalizer=f=1000:width_type=o:width=2:g=2,volume=1.2',
+                    '-af', _enhancement_filter(temp_wav, 80, 6000, 1.2,
+                                               equalizer='equalizer=f=1000:width_type=o:width=2:g=2'),
                     '-acodec', 'mp3', output_path
                 ], capture_output=True, check=True)
                 
@@ -1158,20 +1170,31 @@ def create_name_audio_from_reference(name: str, reference_voice_path: str, outpu
         except:
             print("❌ Complete failure in name audio creation")
 
+@lru_cache(maxsize=64)
+def _probe_stream_info(path: str, mtime: float):
+    """Return (sample_rate, channels, duration) of the first audio stream.
+
+    Cached per (path, mtime) so repeated probes of an unchanged file skip ffprobe.
+    """
+    result = subprocess.run([
+        'ffprobe', '-v', 'quiet', '-select_streams', 'a:0',
+        '-show_entries', 'stream=sample_rate,channels,duration',
+        '-of', 'csv=p=0', path
+    ], capture_output=True, text=True, check=True)
+
+    parts = result.stdout.strip().split(',')
+    sample_rate = int(parts[0]) if parts[0] else 44100
+    channels = int(parts[1]) if parts[1] else 1
+    duration = float(parts[2]) if parts[2] else 0.0
+    return sample_rate, channels, duration
+
 def analyze_reference_voice_characteristics(reference_path: str):
     """Analyze reference voice to extract speech characteristics"""
     try:
-        # Use ffprobe to get basic audio characteristics
-        result = subprocess.run([
-            'ffprobe', '-v', 'quiet', '-select_streams', 'a:0',
-            '-show_entries', 'stream=sample_rate,channels,duration',
-            '-of', 'csv=p=0', reference_path
-        ], capture_output=True, text=True, check=True)
-        
-        parts = result.stdout.strip().split(',')
-        sample_rate = int(parts[0]) if parts[0] else 44100
-        channels = int(parts[1]) if parts[1] else 1
-        duration = float(parts[2]) if parts[2] else 0.0
+        # Use ffprobe (cached per file version) to get basic audio characteristics
+        sample_rate, channels, duration = _probe_stream_info(
+            reference_path, os.path.getmtime(reference_path)
+        )
         
         # Estimate speech rate based on duration and typical speech patterns
         # This is a rough estimation
@@ -1272,7 +1295,6 @@ def extend_short_audio(audio_path: str, min_duration: float = 3.0) -> str:
     """Extend audio file if it's too short for voice cloning"""
     try:
         import subprocess
-        import tempfile
         
         # Get audio duration
         result = subprocess.run([
@@ -1286,40 +1308,18 @@ def extend_short_audio(audio_path: str, min_duration: float = 3.0) -> str:
         if duration < min_duration:
             print(f"⚡ Extending short audio from {duration:.2f}s to {min_duration:.2f}s")
             
-            # Calculate how many times to repeat
-            repeat_count = int((min_duration / duration) + 1)
-            
             # Create the extended audio file
             base_name = os.path.splitext(audio_path)[0]
             extended_path = f"{base_name}_extended.wav"
             
-            # Use FFmpeg to concatenate the audio file with itself
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-                for _ in range(repeat_count):
-                    f.write(f"file '{os.path.abspath(audio_path)}'\n")
-                concat_file = f.name
+            # Loop, decode and write cloning-ready WAV (22.05kHz mono PCM) in a single ffmpeg pass
+            subprocess.run([
+                'ffmpeg', '-y', '-stream_loop', '-1', '-i', audio_path,
+                '-t', str(min_duration), '-ac', '1', '-ar', '22050', '-c:a', 'pcm_s16le', extended_path
+            ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             
-            try:
-                subprocess.run([
-                    'ffmpeg', '-y', '-f', 'concat', '-safe', '0',
-                    '-i', concat_file, '-t', str(min_duration),
-                    '-acodec', 'copy', extended_path
-                ], check=True, capture_output=True)
-                
-                os.unlink(concat_file)
-                print(f"✅ Extended audio saved: {extended_path}")
-                return extended_path
-                
-            except subprocess.CalledProcessError as e:
-                # Fallback: use simple repeat with silence padding
-                subprocess.run([
-                    'ffmpeg', '-y', '-i', audio_path,
-                    '-filter_complex', f'[0:a]aloop=loop={repeat_count-1}:size=44100*{min_duration}[out]',
-                    '-map', '[out]', '-t', str(min_duration), extended_path
-                ], check=True, capture_output=True)
-                
-                print(f"✅ Extended audio with loop: {extended_path}")
-                return extended_path
+            print(f"✅ Extended audio saved: {extended_path}")
+            return extended_path
         else:
             return audio_path
             
@@ -1341,7 +1341,8 @@ def create_minimal_voice_clone(tts_path: str, reference_path: str, output_path:
             '[0:a]atempo=0.95,rubberband=pitch=0.95[tts];'
             '[1:a]compand=attacks=0.3:decays=1.2:points=-80/-80|-12.4/-12.4|-6/-8|0/-6.8[ref];'
             '[tts][ref]amix=inputs=2:duration=first:weights=0.7 0.3',
-            '-ar', '24000', '-ac', '1',
+            # Raw PCM: the clip is re-encoded once when muxed into the video
+            '-ar', '24000', '-ac', '1', '-c:a', 'pcm_s16le',
             output_path
         ], check=True, capture_output=True)
         
@@ -1352,6 +1353,27 @@ def create_minimal_voice_clone(tts_path: str, reference_path: str, output_path:
         print(f"❌ Minimal voice clone failed: {e}")
         return False
 
+def _is_copy_safe(video_path, max_gop=1.0):
+    """Check whether the video's keyframes are close enough to loop with -c copy"""
+    try:
+        # Only keyframes are decoded, so this stays cheap even on long videos
+        result = subprocess.run([
+            'ffprobe', '-v', 'quiet', '-select_streams', 'v:0',
+            '-skip_frame', 'nokey', '-show_entries', 'frame=pts_time',
+            '-of', 'csv=p=0', video_path
+        ], capture_output=True, text=True, check=True)
+        
+        keyframes = [float(line) for line in result.stdout.split() if line.strip() not in ('', 'N/A')]
+        if len(keyframes) < 2:
+            return False
+        
+        largest_gop = max(b - a for a, b in zip(keyframes, keyframes[1:]))
+        return largest_gop <= max_gop
+        
+    except Exception as e:
+        print(f"⚠️ Keyframe probe failed, re-encoding instead: {e}")
+        return False
+
 def validate_video_duration(video_path, min_duration=10.0):
     """Validate that video meets minimum duration requirements and extend if needed"""
     try:
@@ -1374,11 +1396,17 @@ def validate_video_duration(video_path, min_duration=10.0):
             # Calculate loop count needed
             loop_count = int(min_duration / duration) + 1
             
+            # Stream copy is only safe when cuts land near a keyframe
+            if _is_copy_safe(video_path):
+                codec_args = ['-c', 'copy']
+            else:
+                codec_args = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '28', '-c:a', 'copy']
+            
             print(f"🔄 Extending video by looping {loop_count} times...")
             subprocess.run([
                 'ffmpeg', '-y', '-stream_loop', str(loop_count-1), 
                 '-i', video_path, '-t', str(min_duration),
-                '-c', 'copy', extended_path
+                *codec_args, extended_path
             ], check=True)
             
             print(f"✅ Extended video created: {extended_path}")
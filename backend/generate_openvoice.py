@@ -5,10 +5,17 @@ import asyncio
 import subprocess
 import json
 import uuid
+import hashlib
 import ssl
+import atexit
+import concurrent.futures
+import threading
+import importlib.util
+from functools import lru_cache
 import aiohttp
-from generate_video import generate_video_for_name
-from word_trimming import trim_audio_by_word, transcribe_audio
+from generate_video import generate_video_for_name, find_silence_gaps
+from word_trimming import trim_audio_by_word
+from file_utils import link_or_copy
 import edge_tts
 import shutil
 
@@ -23,28 +30,47 @@ sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 RUN_ID = f"{os.getpid()}_{uuid.uuid4().hex[:6]}"
 
 # === Constants & Directories (process-specific) ===
-BASE_UPLOAD_DIR = "uploads"
-BASE_VIDEO_DIR = "generated_videos"
-BASE_TTS_DIR = "tts"
-BASE_CLONED_DIR = "cloned_voices"
-BASE_REFERENCE_AUDIO_DIR = "voice_reference"
-
-UPLOAD_DIR = os.path.join(BASE_UPLOAD_DIR, RUN_ID)
-VIDEO_DIR = os.path.join(BASE_VIDEO_DIR, RUN_ID)
-TTS_DIR = os.path.join(BASE_TTS_DIR, RUN_ID)
-CLONED_DIR = os.path.join(BASE_CLONED_DIR, RUN_ID)
-REFERENCE_AUDIO_DIR = os.path.join(BASE_REFERENCE_AUDIO_DIR, RUN_ID)
+# All intermediate files of one run (or one batch) live under a single root;
+# final videos go to generate_video's output folder
+RUN_DIR = os.path.join("runs", RUN_ID)
+TTS_DIR = os.path.join(RUN_DIR, "tts")
+CLONED_DIR = os.path.join(RUN_DIR, "cloned_voices")
+REFERENCE_AUDIO_DIR = os.path.join(RUN_DIR, "voice_reference")
 
 LANGUAGE = "mr"
 LANGUAGE_VOICE = "hi-IN-MadhurNeural"
 MESSAGE_TEMPLATE = "नमस्कार {name} नमस्कार {name} तुमचं स्वागत आहे {name} तुमचं स्वागत आहे {name}"
 
+# Edge-TTS output cache (shared across runs, evicted least-recently-used first)
+TTS_CACHE_DIR = "tts_cache"
+TTS_CACHE_MAX_BYTES = 200 * 1024 * 1024
+TTS_SAMPLE_RATE = 24000
+
 # OpenVoice configuration
 OPENVOICE_DIR = r"C:\AtulDevelopment\AbhiyanAI\Git\AbhiyaanAI\backend\AbhiyanAI\AbhiyanAI.VideoWorkerService\backend\openvoice"
+OPENVOICE_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "openvoice_worker.py")
+OPENVOICE_JOB_TIMEOUT = 180  # seconds; the first job also pays the model load
+OPENVOICE_MAX_CLONE_BATCH = 8  # clone requests merged into one converter forward pass
+
+# Which OpenVoice methods can work at all - checked once so a missing
+# dependency doesn't cost a subprocess start and timeout on every name
+OPENVOICE_CLI_AVAILABLE = importlib.util.find_spec("openvoice_cli") is not None
+OPENVOICE_API_AVAILABLE = (
+    importlib.util.find_spec("torch") is not None
+    and os.path.exists(os.path.join(OPENVOICE_DIR, "api.py"))
+    and os.path.exists(os.path.join(OPENVOICE_DIR, "se_extractor.py"))
+)
+
+@lru_cache(maxsize=None)
+def ensure_dir(path: str) -> str:
+    """Create a run folder on first use and return its path."""
+    os.makedirs(path, exist_ok=True)
+    return path
+
 
-# Create all required folders
-for directory in [UPLOAD_DIR, VIDEO_DIR, TTS_DIR, CLONED_DIR, REFERENCE_AUDIO_DIR]:
-    os.makedirs(directory, exist_ok=True)
+def cleanup_run_dir():
+    """Remove this run's intermediate files in one go."""
+    shutil.rmtree(RUN_DIR, ignore_errors=True)
 
 
 def safe_delete(path: str):
@@ -57,37 +83,85 @@ def safe_delete(path: str):
         print(f"⚠ Could not delete {path}: {e}")
 
 
+async def run_subprocess(*args, input: bytes = None, env=None, timeout=None):
+    """
+    Run a command without blocking the event loop, optionally feeding `input` to its stdin.
+    Returns (stdout, stderr) as bytes; raises CalledProcessError / TimeoutExpired like subprocess.run.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.PIPE if input is not None else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=env
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(input), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise subprocess.TimeoutExpired(args, timeout)
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, args, stdout, stderr)
+    return stdout, stderr
+
+
+@lru_cache(maxsize=128)
+def _probe_duration(path: str, mtime: float) -> float:
+    """Container duration in seconds; cached per (path, mtime) so each file is probed once."""
+    result = subprocess.run([
+        'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
+        '-of', 'csv=p=0', path
+    ], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip())
+
+
+def get_media_duration(path: str) -> float:
+    return _probe_duration(path, os.path.getmtime(path))
+
+
 def extract_reference_audio(video_path: str, output_wav_path: str):
     """
     Extracts audio from base video and converts it to WAV format (24kHz mono PCM).
-    Normalizes first to 44.1kHz stereo to standardize quality.
+    Resampling and downmixing happen in a single ffmpeg decode pass.
     """
     try:
-        temp_normalized = f"temp_normalized_audio_{RUN_ID}.wav"
         subprocess.run([
             "ffmpeg", "-y",
             "-i", video_path,
-            "-ar", "44100",
-            "-ac", "2",
-            "-c:a", "pcm_s16le",
-            temp_normalized
-        ], check=True)
-
-        subprocess.run([
-            "ffmpeg", "-y",
-            "-i", temp_normalized,
+            "-vn",
             "-ar", "24000",
             "-ac", "1",
             "-c:a", "pcm_s16le",
             output_wav_path
         ], check=True)
 
-        safe_delete(temp_normalized)
         print(f"✅ Reference voice extracted: {output_wav_path}")
     except subprocess.CalledProcessError as e:
         print(f"❌ Failed to extract reference voice: {e}")
 
 
+def tts_cache_path(text: str, voice: str) -> str:
+    """Cache location of the Edge-TTS WAV for (text, voice, sample rate)."""
+    key = hashlib.sha1(f"{text}|{voice}|{TTS_SAMPLE_RATE}".encode("utf-8")).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, f"{key}.wav")
+
+
+def evict_tts_cache():
+    """Drop least-recently-used cache entries until the cache fits TTS_CACHE_MAX_BYTES."""
+    try:
+        entries = [e for e in os.scandir(TTS_CACHE_DIR) if e.is_file() and e.name.endswith(".wav")]
+    except FileNotFoundError:
+        return
+    stats = [(e.path, e.stat()) for e in entries]
+    total = sum(st.st_size for _, st in stats)
+    for path, st in sorted(stats, key=lambda item: item[1].st_mtime):
+        if total <= TTS_CACHE_MAX_BYTES:
+            break
+        safe_delete(path)
+        total -= st.st_size
+
+
 async def generate_tts(text: str, file_path: str):
     """Generate TTS using Edge-TTS with Hindi voice optimized for Marathi names"""
     try:
@@ -96,23 +170,37 @@ async def generate_tts(text: str, file_path: str):
         # Use Hindi voice which can pronounce Marathi names better
         voice = LANGUAGE_VOICE
         
+        cached = tts_cache_path(text, voice)
+        if os.path.exists(cached):
+            shutil.copyfile(cached, file_path)
+            os.utime(cached)  # Mark as recently used
+            print(f"✅ TTS loaded from cache: {file_path}")
+            return True
+        
         communicate = edge_tts.Communicate(text, voice)
         
-        # Generate to MP3 first (Edge-TTS default)
-        temp_mp3 = file_path.replace('.wav', '_temp.mp3')
-        await communicate.save(temp_mp3)
+        # Collect the MP3 stream (Edge-TTS default) in memory
+        mp3_chunks = []
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                mp3_chunks.append(chunk["data"])
         
-        # Convert MP3 to WAV using ffmpeg for better quality and compatibility
-        subprocess.run([
-            'ffmpeg', '-y', '-i', temp_mp3,
-            '-ar', '24000',  # 24kHz sample rate to match reference
+        # Convert MP3 to WAV by piping it through ffmpeg - no temporary MP3 on disk
+        await run_subprocess(
+            'ffmpeg', '-y', '-f', 'mp3', '-i', 'pipe:0',
+            '-ar', str(TTS_SAMPLE_RATE),  # 24kHz sample rate to match reference
             '-ac', '1',      # Mono
             '-c:a', 'pcm_s16le',  # 16-bit PCM
-            file_path
-        ], check=True, capture_output=True)
+            file_path,
+            input=b"".join(mp3_chunks)
+        )
         
-        # Clean up temporary MP3
-        safe_delete(temp_mp3)
+        try:
+            os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+            shutil.copyfile(file_path, cached)
+            evict_tts_cache()
+        except OSError as cache_error:
+            print(f"⚠ Could not cache TTS output: {cache_error}")
         
         print(f"✅ TTS generated: {file_path}")
         return True
@@ -122,6 +210,137 @@ async def generate_tts(text: str, file_path: str):
         return False
 
 
+def openvoice_env():
+    """Environment for OpenVoice processes: offline, local caches, no SSL checks."""
+    env = os.environ.copy()
+    env.update({
+        'CURL_CA_BUNDLE': '',
+        'REQUESTS_CA_BUNDLE': '',
+        'SSL_VERIFY': '0',
+        'PYTHONHTTPSVERIFY': '0',
+        'HF_HUB_OFFLINE': '1',
+        'TRANSFORMERS_OFFLINE': '1',
+        'PYTORCH_TRANSFORMERS_CACHE': os.path.join(OPENVOICE_DIR, 'cache'),
+        'HF_HOME': os.path.join(OPENVOICE_DIR, 'hf_cache')
+    })
+    return env
+
+
+class OpenVoiceWorker:
+    """
+    Long-lived openvoice_worker.py process that keeps the OpenVoice models loaded.
+    Jobs are sent one at a time as JSON lines; the process is (re)started on demand.
+    """
+
+    def __init__(self):
+        self._proc = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._proc is None or self._proc.poll() is not None:
+            print("🚀 Starting OpenVoice worker...")
+            self._proc = subprocess.Popen(
+                [sys.executable, OPENVOICE_WORKER_SCRIPT, OPENVOICE_DIR],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                env=openvoice_env(),
+                text=True,
+                encoding='utf-8',
+                bufsize=1
+            )
+
+    def submit(self, job: dict) -> dict:
+        """Send one job and block until the worker answers it."""
+        with self._lock:
+            try:
+                self._ensure_started()
+                self._proc.stdin.write(json.dumps(job) + "\n")
+                self._proc.stdin.flush()
+                line = self._proc.stdout.readline()
+            except OSError as e:
+                line = ""
+                print(f"❌ OpenVoice worker pipe error: {e}")
+            if not line:
+                self.close()
+                return {"ok": False, "error": "OpenVoice worker exited"}
+            return json.loads(line)
+
+    def close(self):
+        """Stop the worker process; the next job starts a fresh one."""
+        proc, self._proc = self._proc, None
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+openvoice_worker = OpenVoiceWorker()
+atexit.register(openvoice_worker.close)
+
+
+async def run_openvoice_job(job: dict, timeout: float = OPENVOICE_JOB_TIMEOUT) -> dict:
+    """Run a job on the shared OpenVoice worker without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(None, openvoice_worker.submit, job), timeout)
+    except asyncio.TimeoutError:
+        # Killing the worker also unblocks the executor thread waiting on it
+        openvoice_worker.close()
+        return {"ok": False, "error": f"timed out after {timeout}s"}
+
+
+class CloneBatcher:
+    """
+    Coalesces clone requests for the same reference voice into "clone_batch" jobs.
+    While the worker is busy, requests queue up; each flush sends everything
+    queued (up to OPENVOICE_MAX_CLONE_BATCH) as one job.
+    """
+
+    def __init__(self):
+        self._pending = []  # (job, future)
+        self._flusher = None
+
+    async def clone(self, job: dict) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((job, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        return await future
+
+    async def _flush(self):
+        while self._pending:
+            tgt = self._pending[0][0]["tgt"]
+            batch = [p for p in self._pending if p[0]["tgt"] == tgt][:OPENVOICE_MAX_CLONE_BATCH]
+            self._pending = [p for p in self._pending if not any(p is b for b in batch)]
+            try:
+                results = await self._run(batch, tgt)
+            except Exception as e:
+                results = [{"ok": False, "error": str(e)}] * len(batch)
+            for (_, future), result in zip(batch, results):
+                # A caller cancelled while waiting already has a done future; setting it would raise
+                if not future.done():
+                    future.set_result(result)
+
+    async def _run(self, batch, tgt):
+        if len(batch) == 1:
+            return [await run_openvoice_job(batch[0][0])]
+
+        print(f"📦 Cloning {len(batch)} names in one OpenVoice batch")
+        result = await run_openvoice_job({
+            "op": "clone_batch",
+            "tgt": tgt,
+            "items": [{"src": job["src"], "out": job["out"]} for job, _ in batch]
+        }, timeout=OPENVOICE_JOB_TIMEOUT * len(batch))
+        if not result["ok"]:
+            return [result] * len(batch)
+        return [
+            {"ok": True, "out": job["out"]} if ok else {"ok": False, "error": "failed in batch"}
+            for (job, _), ok in zip(batch, result["results"])
+        ]
+
+
+clone_batcher = CloneBatcher()
+
+
 async def generate_openvoice_tts(text: str, file_path: str, reference_wav_path: str):
     """
     Generate speech using OpenVoice TTS with voice cloning.
@@ -131,63 +350,22 @@ async def generate_openvoice_tts(text: str, file_path: str, reference_wav_path:
         print(f"🧬 Generating OpenVoice TTS for: {text}")
         print(f"📁 Using reference: {reference_wav_path}")
         
-        # Ensure OpenVoice directory exists
-        if not os.path.exists(OPENVOICE_DIR):
-            print(f"❌ OpenVoice directory not found: {OPENVOICE_DIR}")
+        if not OPENVOICE_API_AVAILABLE:
+            print(f"❌ OpenVoice API not available (torch or {OPENVOICE_DIR} missing)")
             return False
         
-        # Set environment for offline operation
-        env = os.environ.copy()
-        env.update({
-            'CURL_CA_BUNDLE': '',
-            'REQUESTS_CA_BUNDLE': '',
-            'SSL_VERIFY': '0',
-            'PYTHONHTTPSVERIFY': '0',
-            'HF_HUB_OFFLINE': '1',
-            'TRANSFORMERS_OFFLINE': '1',
-            'PYTORCH_TRANSFORMERS_CACHE': os.path.join(OPENVOICE_DIR, 'cache'),
-            'HF_HOME': os.path.join(OPENVOICE_DIR, 'hf_cache')
+        result = await run_openvoice_job({
+            "op": "tts",
+            "text": text,
+            "tgt": reference_wav_path,
+            "out": file_path
         })
         
-        # Try OpenVoice CLI for TTS generation with voice cloning
-        try:
-            result = subprocess.run([
-                sys.executable, "-c", f"""
-import sys
-sys.path.insert(0, '{OPENVOICE_DIR}')
-from api import BaseSpeakerTTS, ToneColorConverter
-
-# Initialize TTS
-base_speaker_tts = BaseSpeakerTTS('{OPENVOICE_DIR}/checkpoints/base_speakers/EN')
-tone_color_converter = ToneColorConverter('{OPENVOICE_DIR}/checkpoints/converter')
-
-# Generate base TTS
-base_speaker_tts.tts('{text}', '{file_path}', speaker='default', language='English')
-
-# Apply voice conversion using reference
-tone_color_converter.convert(
-    audio_src_path='{file_path}',
-    src_se='{OPENVOICE_DIR}/checkpoints/base_speakers/EN/en_default_se.pth',
-    tgt_se='{reference_wav_path}',
-    output_path='{file_path}'
-)
-print('✅ OpenVoice TTS with cloning completed')
-"""], 
-                env=env, 
-                capture_output=True, 
-                text=True, 
-                timeout=60
-            )
-            
-            if result.returncode == 0:
-                print(f"✅ OpenVoice TTS generated successfully: {file_path}")
-                return True
-            else:
-                print(f"❌ OpenVoice TTS failed: {result.stderr}")
-                return False
-                
-        except subprocess.TimeoutExpired:
-            print("❌ OpenVoice TTS timed out")
+        if result["ok"]:
+            print(f"✅ OpenVoice TTS generated successfully: {file_path}")
+            return True
+        else:
+            print(f"❌ OpenVoice TTS failed: {result['error']}")
             return False
             
     except Exception as e:
@@ -195,7 +373,7 @@ print('✅ OpenVoice TTS with cloning completed')
         return False
 
 
-def clone_voice_openvoice(tts_wav_path: str, cloned_wav_path: str, reference_wav_path: str):
+async def clone_voice_openvoice(tts_wav_path: str, cloned_wav_path: str, reference_wav_path: str):
     """Clone voice using OpenVoice - main cloning function"""
     try:
         print(f"🧬 Starting OpenVoice cloning...")
@@ -212,141 +390,50 @@ def clone_voice_openvoice(tts_wav_path: str, cloned_wav_path: str, reference_wav
             print(f"❌ OpenVoice directory not found: {OPENVOICE_DIR}")
             return False
 
-        # Set environment for offline operation
-        env = os.environ.copy()
-        env.update({
-            'CURL_CA_BUNDLE': '',
-            'REQUESTS_CA_BUNDLE': '',
-            'SSL_VERIFY': '0',
-            'PYTHONHTTPSVERIFY': '0',
-            'HF_HUB_OFFLINE': '1',
-            'TRANSFORMERS_OFFLINE': '1',
-            'PYTORCH_TRANSFORMERS_CACHE': os.path.join(OPENVOICE_DIR, 'cache'),
-            'HF_HOME': os.path.join(OPENVOICE_DIR, 'hf_cache')
-        })
-
         # Method 1: Try OpenVoice CLI
-        try:
-            print("🔄 Trying OpenVoice CLI...")
-            result = subprocess.run([
-                sys.executable, "-m", "openvoice_cli", "single",
-                "-i", tts_wav_path,
-                "-r", reference_wav_path,
-                "-o", cloned_wav_path
-            ], env=env, capture_output=True, text=True, timeout=60)
-            
-            if result.returncode == 0 and os.path.exists(cloned_wav_path):
-                print(f"✅ OpenVoice CLI cloning successful: {cloned_wav_path}")
-                return True
-            else:
-                print(f"❌ OpenVoice CLI failed: {result.stderr}")
-        except subprocess.TimeoutExpired:
-            print("❌ OpenVoice CLI timed out")
-        except Exception as cli_error:
-            print(f"❌ OpenVoice CLI error: {cli_error}")
-
-        # Method 2: Try OpenVoice API directly
-        try:
-            print("🔄 Trying OpenVoice API directly...")
-            result = subprocess.run([
-                sys.executable, "-c", f"""
-import sys
-sys.path.insert(0, '{OPENVOICE_DIR}')
-import torch
-from api import ToneColorConverter
-
-# Initialize converter
-converter = ToneColorConverter('{OPENVOICE_DIR}/checkpoints/converter')
-
-# Load source and target speaker embeddings
-src_path = '{tts_wav_path}'
-tgt_path = '{reference_wav_path}'
-output_path = '{cloned_wav_path}'
-
-print(f'Loading source audio: {{src_path}}')
-print(f'Loading target reference: {{tgt_path}}')
-
-# Convert voice
-converter.convert(
-    audio_src_path=src_path,
-    src_se=None,  # Will be computed from source
-    tgt_se=tgt_path,  # Target speaker embedding from reference
-    output_path=output_path,
-    message='Converting voice...'
-)
-print('✅ OpenVoice API conversion completed')
-"""], 
-                env=env, 
-                capture_output=True, 
-                text=True, 
-                timeout=120
-            )
+        if not OPENVOICE_CLI_AVAILABLE:
+            print("⏭️ openvoice_cli not installed, skipping CLI method")
+        else:
+            try:
+                print("🔄 Trying OpenVoice CLI...")
+                await run_subprocess(
+                    sys.executable, "-m", "openvoice_cli", "single",
+                    "-i", tts_wav_path,
+                    "-r", reference_wav_path,
+                    "-o", cloned_wav_path,
+                    env=openvoice_env(), timeout=60
+                )
             
-            if result.returncode == 0 and os.path.exists(cloned_wav_path):
-                print(f"✅ OpenVoice API cloning successful: {cloned_wav_path}")
-                return True
-            else:
-                print(f"❌ OpenVoice API failed: {result.stderr}")
-                
-        except subprocess.TimeoutExpired:
-            print("❌ OpenVoice API timed out")
-        except Exception as api_error:
-            print(f"❌ OpenVoice API error: {api_error}")
-
-        # Method 3: Try alternative OpenVoice approach
-        try:
-            print("🔄 Trying alternative OpenVoice approach...")
-            result = subprocess.run([
-                sys.executable, "-c", f"""
-import sys
-import os
-sys.path.insert(0, '{OPENVOICE_DIR}')
+                if os.path.exists(cloned_wav_path):
+                    print(f"✅ OpenVoice CLI cloning successful: {cloned_wav_path}")
+                    return True
+                else:
+                    print("❌ OpenVoice CLI produced no output")
+            except subprocess.CalledProcessError as cli_error:
+                print(f"❌ OpenVoice CLI failed: {cli_error.stderr.decode(errors='replace')}")
+            except subprocess.TimeoutExpired:
+                print("❌ OpenVoice CLI timed out")
+            except Exception as cli_error:
+                print(f"❌ OpenVoice CLI error: {cli_error}")
+
+        # Method 2: OpenVoice API through the persistent worker
+        if not OPENVOICE_API_AVAILABLE:
+            print("⏭️ OpenVoice API not available (torch or api.py missing), skipping worker")
+            return False
 
-try:
-    import torch
-    from openvoice import se_extractor
-    from openvoice.api import ToneColorConverter
-    
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f'Using device: {{device}}')
-    
-    # Initialize model
-    ckpt_converter = '{OPENVOICE_DIR}/checkpoints/converter'
-    converter = ToneColorConverter(ckpt_converter, device=device)
-    
-    # Extract speaker embeddings
-    target_se, audio_name = se_extractor.get_se('{reference_wav_path}', converter, target_dir='temp', vad=True)
-    
-    # Convert voice
-    converter.convert(
-        audio_src_path='{tts_wav_path}',
-        src_se=None,
-        tgt_se=target_se, 
-        output_path='{cloned_wav_path}',
-        message="Voice conversion"
-    )
-    print('✅ Alternative OpenVoice conversion completed')
-    
-except Exception as e:
-    print(f'❌ Alternative approach failed: {{e}}')
-    import traceback
-    traceback.print_exc()
-"""], 
-                env=env, 
-                capture_output=True, 
-                text=True, 
-                timeout=180
-            )
-            
-            if result.returncode == 0 and os.path.exists(cloned_wav_path):
-                print(f"✅ Alternative OpenVoice cloning successful: {cloned_wav_path}")
-                return True
-            else:
-                print(f"❌ Alternative OpenVoice failed: {result.stderr}")
-                print(f"❌ Alternative OpenVoice stdout: {result.stdout}")
-                
-        except Exception as alt_error:
-            print(f"❌ Alternative OpenVoice error: {alt_error}")
+        print("🔄 Trying OpenVoice API worker...")
+        result = await clone_batcher.clone({
+            "op": "clone",
+            "src": tts_wav_path,
+            "tgt": reference_wav_path,
+            "out": cloned_wav_path
+        })
+        
+        if result["ok"] and os.path.exists(cloned_wav_path):
+            print(f"✅ OpenVoice API cloning successful: {cloned_wav_path}")
+            return True
+        else:
+            print(f"❌ OpenVoice API failed: {result.get('error')}")
 
         return False
 
@@ -355,59 +442,72 @@ except Exception as e:
         return False
 
 
-def clone_voice_fallback(tts_wav_path: str, cloned_wav_path: str, reference_wav_path: str):
+async def clone_voice_fallback(tts_wav_path: str, cloned_wav_path: str, reference_wav_path: str):
     """Fallback voice cloning using basic audio processing when OpenVoice fails"""
     try:
         print("🔄 Using fallback voice processing...")
         
         # Basic audio processing using ffmpeg
-        subprocess.run([
+        await run_subprocess(
             'ffmpeg', '-y',
             '-i', tts_wav_path,
             '-af', 'equalizer=f=1000:width_type=o:width=2:g=3,compand=attacks=0.1:decays=0.2:points=-90/-90|-70/-60|-40/-40|-20/-20|0/0',
             '-ar', '24000',
             '-ac', '1',
             cloned_wav_path
-        ], check=True, capture_output=True)
+        )
         
         print(f"✅ Fallback voice processing completed: {cloned_wav_path}")
         return True
         
     except Exception as e:
         print(f"❌ Fallback processing failed: {e}")
-        # Final fallback: copy original TTS
+        # Final fallback: reuse original TTS (hardlink when on the same volume)
         try:
-            shutil.copy2(tts_wav_path, cloned_wav_path)
-            print(f"🔄 Copied TTS as final fallback: {cloned_wav_path}")
+            link_or_copy(tts_wav_path, cloned_wav_path)
+            print(f"🔄 Reused TTS as final fallback: {cloned_wav_path}")
             return True
         except Exception as copy_error:
             print(f"❌ Final fallback copy failed: {copy_error}")
             return False
 
 
-async def generate_progress(input_name: str, base_video_path: str):
-    """Main function to generate personalized video with voice cloning"""
+async def generate_progress(input_name: str, base_video_path: str, reference_wav_path: str = None,
+                            silent_segments: list = None):
+    """
+    Main function to generate personalized video with voice cloning.
+    Pass reference_wav_path / silent_segments to reuse analysis already done on base_video_path.
+    """
     try:
         print(f"🚀 Starting video generation for: {input_name}")
         print(f"📹 Base video: {base_video_path}")
         
-        # Step 1: Extract reference audio from base video
-        reference_wav_path = os.path.join(REFERENCE_AUDIO_DIR, f"{input_name}_{RUN_ID}_reference.wav")
-        print("🎤 Extracting reference audio from base video...")
-        extract_reference_audio(base_video_path, reference_wav_path)
+        loop = asyncio.get_running_loop()
+        
+        # Step 1: Extract reference audio from base video, and start silence
+        # detection in the background - its result is only needed in step 4
+        if silent_segments is None:
+            print("🔍 Analyzing base video for silent segments...")
+            silence_task = loop.run_in_executor(None, find_silence_gaps, base_video_path)
+        
+        owns_reference = reference_wav_path is None
+        if owns_reference:
+            reference_wav_path = os.path.join(ensure_dir(REFERENCE_AUDIO_DIR), f"{input_name}_{RUN_ID}_reference.wav")
+            print("🎤 Extracting reference audio from base video...")
+            await loop.run_in_executor(None, extract_reference_audio, base_video_path, reference_wav_path)
         
         if not os.path.exists(reference_wav_path):
             print("❌ Failed to extract reference audio")
             return
         
         # Step 2: Generate TTS - Try OpenVoice TTS first
-        tts_wav = os.path.join(TTS_DIR, f"{input_name}.wav")
+        tts_wav = os.path.join(ensure_dir(TTS_DIR), f"{input_name}.wav")
         name_text = input_name
         
         print("🎙️ Attempting OpenVoice TTS with voice cloning...")
-        tts_success = await generate_openvoice_tts(name_text, tts_wav, reference_wav_path)
+        used_openvoice_tts = await generate_openvoice_tts(name_text, tts_wav, reference_wav_path)
         
-        if not tts_success:
+        if not used_openvoice_tts:
             print("🔄 OpenVoice TTS failed, falling back to Edge-TTS...")
             tts_success = await generate_tts(name_text, tts_wav)
             
@@ -416,17 +516,17 @@ async def generate_progress(input_name: str, base_video_path: str):
                 return
         
         # Step 3: Voice cloning (if using Edge-TTS)
-        cloned_wav = os.path.join(CLONED_DIR, f"{input_name}.wav")
+        cloned_wav = os.path.join(ensure_dir(CLONED_DIR), f"{input_name}.wav")
         
-        if tts_success and not await generate_openvoice_tts(name_text, tts_wav, reference_wav_path):
+        if not used_openvoice_tts:
             # We used Edge-TTS, so we need to clone the voice
             print("🧬 Starting voice cloning process...")
             
-            cloning_success = clone_voice_openvoice(tts_wav, cloned_wav, reference_wav_path)
+            cloning_success = await clone_voice_openvoice(tts_wav, cloned_wav, reference_wav_path)
             
             if not cloning_success:
                 print("🔄 OpenVoice cloning failed, using fallback...")
-                cloning_success = clone_voice_fallback(tts_wav, cloned_wav, reference_wav_path)
+                cloning_success = await clone_voice_fallback(tts_wav, cloned_wav, reference_wav_path)
                 
             if not cloning_success:
                 print("❌ All voice cloning methods failed")
@@ -436,38 +536,18 @@ async def generate_progress(input_name: str, base_video_path: str):
             cloned_wav = tts_wav
         
         # Step 4: Detect silence in base video for name insertion
-        print("🔍 Analyzing base video for silent segments...")
-        
-        # Use word_trimming to find silent segments
-        transcript_result = transcribe_audio(base_video_path)
-        if not transcript_result:
-            print("❌ Failed to transcribe base video")
-            return
-        
-        segments, full_transcript = transcript_result
-        
-        # Find a suitable silent gap (longer than 1.5 seconds)
-        silent_segments = []
-        for i in range(len(segments) - 1):
-            current_end = segments[i]['end']
-            next_start = segments[i + 1]['start'] 
-            gap_duration = next_start - current_end
-            
-            if gap_duration >= 1.5:  # At least 1.5 seconds of silence
-                silent_segments.append({
-                    'start': current_end,
-                    'end': next_start,
-                    'duration': gap_duration
-                })
+        # Silent gaps of at least 1.5 seconds (started in step 1)
+        if silent_segments is None:
+            try:
+                silent_segments = await silence_task
+            except Exception as e:
+                print(f"⚠️ Silence detection failed: {e}")
+                silent_segments = []
         
         if not silent_segments:
             print("⚠️ No suitable silent segments found, using end of video")
             # Get video duration and insert at the end
-            probe_result = subprocess.run([
-                'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-                '-of', 'csv=p=0', base_video_path
-            ], capture_output=True, text=True, check=True)
-            video_duration = float(probe_result.stdout.strip())
+            video_duration = await loop.run_in_executor(None, get_media_duration, base_video_path)
             insert_time = video_duration - 0.5  # Insert 0.5 seconds before end
         else:
             # Use the first suitable silent segment
@@ -479,21 +559,21 @@ async def generate_progress(input_name: str, base_video_path: str):
         
         # Step 5: Generate the final video
         print("🎬 Generating final video...")
-        output_video_path = await generate_video_for_name(
-            input_name, 
-            base_video_path, 
-            cloned_wav, 
-            insert_time
+        # generate_video_for_name is synchronous, so run it off the loop
+        output_video_path = await loop.run_in_executor(
+            None, generate_video_for_name, input_name, base_video_path, cloned_wav, insert_time
         )
         
         if output_video_path and os.path.exists(output_video_path):
             print(f"✅ Video generation completed: {output_video_path}")
             
             # Clean up temporary files
-            safe_delete(reference_wav_path)
+            if owns_reference:
+                safe_delete(reference_wav_path)
             if tts_wav != cloned_wav:  # Only delete if they're different files
                 safe_delete(tts_wav)
             safe_delete(cloned_wav)
+            return output_video_path
             
         else:
             print("❌ Video generation failed")
@@ -504,11 +584,66 @@ async def generate_progress(input_name: str, base_video_path: str):
         traceback.print_exc()
 
 
+async def generate_batch(names, base_video_path: str, concurrency: int = None):
+    """
+    Generate videos for many names in one process.
+    The base video is analyzed once (reference audio + silent gaps, in parallel
+    worker processes) and shared; at most `concurrency` names are processed at the same time.
+    """
+    names = list(dict.fromkeys(names))  # Same name -> same output files
+    concurrency = concurrency or max(1, (os.cpu_count() or 2) // 2)
+    print(f"🚀 Starting batch of {len(names)} names (concurrency {concurrency})")
+    
+    loop = asyncio.get_running_loop()
+    reference_wav_path = os.path.join(ensure_dir(REFERENCE_AUDIO_DIR), f"batch_{RUN_ID}_reference.wav")
+    print("🎤 Extracting reference audio and analyzing silent segments...")
+    # Silence scanning is pure-Python per-frame work, so use processes rather than GIL-bound threads
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as pool:
+        ref_task = loop.run_in_executor(pool, extract_reference_audio, base_video_path, reference_wav_path)
+        silence_task = loop.run_in_executor(pool, find_silence_gaps, base_video_path)
+        await ref_task
+        try:
+            silent_segments = await silence_task
+        except Exception as e:
+            print(f"⚠️ Silence detection failed: {e}")
+            silent_segments = []
+    if not os.path.exists(reference_wav_path):
+        print("❌ Failed to extract reference audio")
+        return []
+    
+    sem = asyncio.Semaphore(concurrency)
+    
+    async def bounded(name):
+        async with sem:
+            return await generate_progress(
+                name, base_video_path,
+                reference_wav_path=reference_wav_path,
+                silent_segments=silent_segments
+            )
+    
+    try:
+        results = await asyncio.gather(*(bounded(name) for name in names))
+    finally:
+        safe_delete(reference_wav_path)
+    
+    print(f"✅ Batch finished: {sum(1 for r in results if r)}/{len(names)} videos generated")
+    return results
+
+
 if __name__ == "__main__":
     if len(sys.argv) != 3:
         print("Usage: python generate.py \"<Full Name>\" \"<Base Video Path>\"")
+        print("       python generate.py names.txt \"<Base Video Path>\"  (one name per line)")
         sys.exit(1)
 
-    input_name = sys.argv[1]
+    target = sys.argv[1]
     base_video_path = sys.argv[2]
-    asyncio.run(generate_progress(input_name, base_video_path))
+    try:
+        if target.endswith(".txt") and os.path.isfile(target):
+            with open(target, encoding="utf-8") as f:
+                names = [line.strip() for line in f if line.strip()]
+            asyncio.run(generate_batch(names, base_video_path))
+        else:
+            asyncio.run(generate_progress(target, base_video_path))
+    finally:
+        cleanup_run_dir()
@@ -5,13 +5,27 @@ import asyncio
 import subprocess
 import json
 import uuid
+import tempfile
+from functools import lru_cache
 import ssl
 import aiohttp
-from generate_video import generate_video_for_name
-from word_trimming import trim_audio_by_word, transcribe_audio
+import numpy as np
+from generate_video import generate_video_for_name, find_silence_gaps
+from word_trimming import trim_audio_by_word
 import edge_tts
 import shutil
 
+# Optional spectral voice cloning module from the repository root, resolved once at import
+_advanced_voice_cloning = None
+_parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.exists(os.path.join(_parent_dir, 'advanced_voice_cloning.py')):
+    if _parent_dir not in sys.path:
+        sys.path.insert(0, _parent_dir)
+    try:
+        from advanced_voice_cloning import advanced_voice_cloning as _advanced_voice_cloning
+    except ImportError as import_error:
+        print(f"⚠️ Advanced cloning import failed: {import_error}")
+
 # Disable SSL verification globally for edge_tts
 ssl._create_default_https_context = ssl._create_unverified_context
 
@@ -57,29 +71,19 @@ def safe_delete(path: str):
 def extract_reference_audio(video_path: str, output_wav_path: str):
     """
     Extracts audio from base video and converts it to WAV format (24kHz mono PCM).
-    Normalizes first to 44.1kHz stereo to standardize quality.
+    Resampling and downmixing happen in a single ffmpeg decode pass.
     """
     try:
-        temp_normalized = f"temp_normalized_audio_{RUN_ID}.wav"
         subprocess.run([
             "ffmpeg", "-y",
             "-i", video_path,
-            "-ar", "44100",
-            "-ac", "2",
-            "-c:a", "pcm_s16le",
-            temp_normalized
-        ], check=True)
-
-        subprocess.run([
-            "ffmpeg", "-y",
-            "-i", temp_normalized,
+            "-vn",
             "-ar", "24000",
             "-ac", "1",
             "-c:a", "pcm_s16le",
             output_wav_path
         ], check=True)
 
-        safe_delete(temp_normalized)
         print(f"✅ Reference voice extracted: {output_wav_path}")
     except subprocess.CalledProcessError as e:
         print(f"❌ Failed to extract reference voice: {e}")
@@ -95,21 +99,32 @@ async def generate_tts(text: str, file_path: str):
         
         communicate = edge_tts.Communicate(text, voice)
         
-        # Generate to MP3 first (Edge-TTS default)
-        temp_mp3 = file_path.replace('.wav', '_temp.mp3')
-        await communicate.save(temp_mp3)
-        
-        # Convert MP3 to WAV using ffmpeg for better quality and compatibility
-        subprocess.run([
-            'ffmpeg', '-y', '-i', temp_mp3,
+        # Decode the MP3 stream (Edge-TTS default) to WAV while it downloads -
+        # chunks go straight into ffmpeg's stdin, no temporary MP3 on disk
+        proc = await asyncio.create_subprocess_exec(
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'mp3', '-i', 'pipe:0',
             '-ar', '24000',  # 24kHz sample rate to match reference
             '-ac', '1',      # Mono
             '-c:a', 'pcm_s16le',  # 16-bit PCM
-            file_path
-        ], check=True, capture_output=True)
-        
-        # Clean up temporary MP3
-        safe_delete(temp_mp3)
+            file_path,
+            stdin=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    proc.stdin.write(chunk["data"])
+                    await proc.stdin.drain()
+            proc.stdin.close()
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            _, stderr = await proc.communicate()
+        
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
         
         print(f"✅ TTS generated: {file_path}")
         return True
@@ -135,33 +150,17 @@ def clone_voice_advanced_local(tts_wav_path: str, cloned_wav_path: str, referenc
         os.makedirs(os.path.dirname(cloned_wav_path), exist_ok=True)
 
         # Use the advanced spectral voice cloning that's already working
-        try:
-            # Import advanced voice cloning module
-            import sys
-            import os
-            advanced_cloning_path = os.path.join(os.path.dirname(__file__), '..', 'advanced_voice_cloning.py')
-            
-            if os.path.exists(advanced_cloning_path):
-                # Add parent directory to Python path
-                parent_dir = os.path.dirname(os.path.dirname(__file__))
-                if parent_dir not in sys.path:
-                    sys.path.insert(0, parent_dir)
-                
-                try:
-                    from advanced_voice_cloning import advanced_voice_cloning
-                    success = advanced_voice_cloning(
-                        tts_wav_path, reference_wav_path, cloned_wav_path,
-                        pitch_alpha=0.8, envelope_alpha=0.7
-                    )
-                    if success:
-                        print(f"✅ Advanced voice cloning successful: {cloned_wav_path}")
-                        return True
-                except ImportError as import_error:
-                    print(f"⚠️ Advanced cloning import failed: {import_error}")
-                except Exception as advanced_error:
-                    print(f"⚠️ Advanced cloning failed: {advanced_error}")
-        except:
-            pass
+        if _advanced_voice_cloning is not None:
+            try:
+                success = _advanced_voice_cloning(
+                    tts_wav_path, reference_wav_path, cloned_wav_path,
+                    pitch_alpha=0.8, envelope_alpha=0.7
+                )
+                if success:
+                    print(f"✅ Advanced voice cloning successful: {cloned_wav_path}")
+                    return True
+            except Exception as advanced_error:
+                print(f"⚠️ Advanced cloning failed: {advanced_error}")
         
         # Fallback to enhanced FFmpeg processing
         print("🔄 Using enhanced FFmpeg voice cloning...")
@@ -173,36 +172,40 @@ def clone_voice_advanced_local(tts_wav_path: str, cloned_wav_path: str, referenc
         return False
 
 
+# Pitch shift factors for the only adjustments the RMS heuristic produces (semitones)
+PITCH_FACTORS = {adjustment: 2 ** (adjustment / 12) for adjustment in (-1, 0, 2)}
+
+
+@lru_cache(maxsize=None)
+def pitch_filter(pitch_adjustment: int, sample_rate: int) -> str:
+    """Stage-1 filter for a pitch adjustment at a sample rate ('anull' when there is no shift)"""
+    if pitch_adjustment == 0:
+        return 'anull'
+    return f'asetrate={int(sample_rate * PITCH_FACTORS[pitch_adjustment])},aresample={sample_rate}'
+
+
 def enhanced_ffmpeg_voice_cloning(tts_wav_path: str, reference_wav_path: str, output_path: str):
     """Enhanced voice cloning using sophisticated FFmpeg filters"""
     try:
-        from pydub import AudioSegment
+        import soundfile as sf
         import numpy as np
         
-        print("🎵 Loading TTS and reference audio...")
-        tts_audio = AudioSegment.from_wav(tts_wav_path)
-        ref_audio = AudioSegment.from_wav(reference_wav_path)
+        def load_mono(path):
+            # Raw int16 PCM straight into NumPy, decoded once; stereo is downmixed in C
+            samples, sample_rate = sf.read(path, dtype='int16', always_2d=False)
+            if samples.ndim == 2:
+                samples = np.mean(samples, axis=1, dtype=np.int32).astype(np.int16)
+            return samples, sample_rate
         
-        # Convert to numpy arrays for analysis
-        tts_samples = np.array(tts_audio.get_array_of_samples())
-        ref_samples = np.array(ref_audio.get_array_of_samples())
-        
-        if tts_audio.channels == 2:
-            tts_samples = tts_samples.reshape((-1, 2))
-            tts_samples = tts_samples.mean(axis=1)
-        if ref_audio.channels == 2:
-            ref_samples = ref_samples.reshape((-1, 2))
-            ref_samples = ref_samples.mean(axis=1)
-        
-        # Analyze reference voice characteristics
-        ref_sample_rate = ref_audio.frame_rate
-        tts_sample_rate = tts_audio.frame_rate
+        print("🎵 Loading TTS and reference audio...")
+        tts_samples, tts_sample_rate = load_mono(tts_wav_path)
+        ref_samples, ref_sample_rate = load_mono(reference_wav_path)
         
         print("🔬 Analyzing voice characteristics...")
         
         # Basic pitch analysis
-        ref_rms = ref_audio.rms
-        tts_rms = tts_audio.rms
+        ref_rms = float(np.sqrt(np.mean(ref_samples.astype(np.float32) ** 2))) if ref_samples.size else 0.0
+        tts_rms = float(np.sqrt(np.mean(tts_samples.astype(np.float32) ** 2))) if tts_samples.size else 0.0
         
         # Estimate pitch characteristics from RMS and frequency content
         pitch_adjustment = 0
@@ -216,37 +219,13 @@ def enhanced_ffmpeg_voice_cloning(tts_wav_path: str, reference_wav_path: str, ou
         
         print(f"🎼 Estimated pitch adjustment: {pitch_adjustment} semitones")
         
-        # Multi-stage FFmpeg processing
-        temp_files = []
-        
+        # All stages run as one ffmpeg filter graph - no intermediate WAVs
         # Stage 1: Pitch and formant correction
-        temp_pitch = output_path.replace('.wav', '_pitch.wav')
-        temp_files.append(temp_pitch)
-        
-        # Apply pitch shift if needed
-        if abs(pitch_adjustment) > 0:
-            pitch_factor = 2 ** (pitch_adjustment / 12)
-            subprocess.run([
-                'ffmpeg', '-y', '-i', tts_wav_path,
-                '-af', f'asetrate={int(ref_sample_rate * pitch_factor)},aresample={ref_sample_rate}',
-                '-ar', str(ref_sample_rate),
-                '-ac', '1',
-                temp_pitch
-            ], capture_output=True, check=True)
-        else:
-            subprocess.run([
-                'ffmpeg', '-y', '-i', tts_wav_path,
-                '-ar', str(ref_sample_rate),
-                '-ac', '1',
-                temp_pitch
-            ], capture_output=True, check=True)
+        filters = [pitch_filter(pitch_adjustment, ref_sample_rate)]
         
         # Stage 2: Spectral shaping for naturalness
-        temp_spectral = output_path.replace('.wav', '_spectral.wav')
-        temp_files.append(temp_spectral)
-        
         # Enhanced spectral filters for Indian voice characteristics
-        spectral_filters = [
+        filters += [
             'highpass=f=80',   # Remove noise
             'lowpass=f=8000',  # Remove digital artifacts
             
@@ -266,17 +245,8 @@ def enhanced_ffmpeg_voice_cloning(tts_wav_path: str, reference_wav_path: str, ou
             'treble=g=-1:f=5000:width_type=o:width=1',
         ]
         
-        subprocess.run([
-            'ffmpeg', '-y', '-i', temp_pitch,
-            '-af', ','.join(spectral_filters),
-            temp_spectral
-        ], capture_output=True, check=True)
-        
         # Stage 3: Harmonic enhancement
-        temp_harmonic = output_path.replace('.wav', '_harmonic.wav')
-        temp_files.append(temp_harmonic)
-        
-        harmonic_filters = [
+        filters += [
             # Subtle harmonic enhancement for naturalness
             'aphaser=in_gain=0.3:out_gain=0.9:delay=2:decay=0.3:speed=0.3',
             
@@ -287,40 +257,21 @@ def enhanced_ffmpeg_voice_cloning(tts_wav_path: str, reference_wav_path: str, ou
             'agate=threshold=0.008:ratio=3:attack=5:release=50',
         ]
         
-        subprocess.run([
-            'ffmpeg', '-y', '-i', temp_spectral,
-            '-af', ','.join(harmonic_filters),
-            temp_harmonic
-        ], capture_output=True, check=True)
-        
-        # Stage 4: Final processing and volume matching
-        tts_processed = AudioSegment.from_wav(temp_harmonic)
-        
-        # Match volume characteristics
-        if ref_rms > 0 and tts_processed.rms > 0:
-            volume_adjustment = ref_rms / tts_processed.rms
-            volume_db = 20 * np.log10(np.clip(volume_adjustment, 0.3, 3.0))
-            tts_processed = tts_processed + volume_db
+        # Stage 4: Volume matching (from the raw input levels) and subtle reverb to match environment
+        if ref_rms > 0 and tts_rms > 0:
+            volume_db = 20 * np.log10(np.clip(ref_rms / tts_rms, 0.3, 3.0))
+            filters.append(f'volume={volume_db:.2f}dB')
             print(f"🔊 Volume adjustment: {volume_db:.1f} dB")
-        
-        # Apply subtle reverb to match environment
-        temp_final = output_path.replace('.wav', '_final.wav')
-        temp_files.append(temp_final)
+        filters += ['aecho=0.6:0.8:80:0.2', 'aecho=0.3:0.6:150:0.15']
         
         subprocess.run([
-            'ffmpeg', '-y', '-i', temp_harmonic,
-            '-af', 'aecho=0.6:0.8:80:0.2,aecho=0.3:0.6:150:0.15',
-            temp_final
+            'ffmpeg', '-y', '-i', tts_wav_path,
+            '-af', ','.join(filters),
+            '-ar', str(ref_sample_rate),
+            '-ac', '1',
+            output_path
         ], capture_output=True, check=True)
         
-        # Load final processed audio and export
-        final_audio = AudioSegment.from_wav(temp_final)
-        final_audio.export(output_path, format="wav")
-        
-        # Clean up temporary files
-        for temp_file in temp_files:
-            safe_delete(temp_file)
-        
         print(f"✅ Enhanced FFmpeg voice cloning completed: {output_path}")
         
     except Exception as e:
@@ -333,75 +284,72 @@ def enhanced_ffmpeg_voice_cloning(tts_wav_path: str, reference_wav_path: str, ou
             print(f"❌ Final fallback copy failed: {copy_error}")
 
 
+def extract_reference_with_duration(video_path: str, output_wav_path: str):
+    """Extract the reference WAV; returns (path, duration) - the duration comes from its header"""
+    import soundfile as sf
+    extract_reference_audio(video_path, output_wav_path)
+    if not os.path.exists(output_wav_path):
+        raise RuntimeError(f"reference extraction failed for {video_path}")
+    return output_wav_path, sf.info(output_wav_path).duration
+
+
 async def generate_progress(input_name: str, base_video_path: str):
     """Main function to generate personalized video with voice cloning"""
+    # Per-name intermediates share one scratch folder, removed in one go at the end
+    work_dir = tempfile.mkdtemp(prefix=f"{input_name}_", dir=TTS_DIR)
+    work_prefix = os.path.join(work_dir, input_name)
     try:
         print(f"🚀 Starting video generation for: {input_name}")
         print(f"📹 Base video: {base_video_path}")
         
-        # Step 1: Extract reference audio from base video
-        reference_wav_path = os.path.join(REFERENCE_AUDIO_DIR, f"{input_name}_{RUN_ID}_reference.wav")
-        print("🎤 Extracting reference audio from base video...")
-        extract_reference_audio(base_video_path, reference_wav_path)
+        loop = asyncio.get_running_loop()
         
-        if not os.path.exists(reference_wav_path):
-            print("❌ Failed to extract reference audio")
-            return
-        
-        # Step 2: Generate TTS using Edge-TTS (or fallback to local TTS)
-        tts_wav = os.path.join(TTS_DIR, f"{input_name}.wav")
+        # Steps 1, 2 and 4 only depend on the inputs, so run them side by side:
+        # reference extraction and silence detection on executor threads, TTS on the loop
+        tts_wav = f"{work_prefix}_tts.wav"
+        reference_wav = f"{work_prefix}_reference.wav"
         name_text = input_name
         
+        print("🎤 Extracting reference audio from base video...")
+        ref_task = loop.run_in_executor(None, extract_reference_with_duration, base_video_path, reference_wav)
+        print("🔍 Analyzing base video for silent segments...")
+        silence_task = loop.run_in_executor(None, find_silence_gaps, base_video_path)
         print("🎙️ Generating TTS...")
-        tts_success = await generate_tts(name_text, tts_wav)
+        tts_task = asyncio.create_task(generate_tts(name_text, tts_wav))
+        
+        reference, tts_success, silent_segments = await asyncio.gather(
+            ref_task, tts_task, silence_task, return_exceptions=True
+        )
         
-        if not tts_success:
+        if isinstance(reference, BaseException):
+            print(f"❌ Failed to extract reference audio: {reference}")
+            return
+        reference_wav_path, video_duration = reference
+        
+        if tts_success is not True:
             print("❌ TTS generation failed")
             return
         
+        if isinstance(silent_segments, BaseException):
+            print(f"⚠️ Silence detection failed: {silent_segments}")
+            silent_segments = []
+        
         # Step 3: Advanced local voice cloning
-        cloned_wav = os.path.join(CLONED_DIR, f"{input_name}.wav")
+        cloned_wav = f"{work_prefix}_cloned.wav"
         
         print("🧬 Starting advanced voice cloning...")
-        cloning_success = clone_voice_advanced_local(tts_wav, cloned_wav, reference_wav_path)
+        cloning_success = await loop.run_in_executor(
+            None, clone_voice_advanced_local, tts_wav, cloned_wav, reference_wav_path
+        )
         
         if not cloning_success:
             print("❌ Voice cloning failed")
             return
         
-        # Step 4: Detect silence in base video for name insertion
-        print("🔍 Analyzing base video for silent segments...")
-        
-        # Use word_trimming to find silent segments
-        transcript_result = transcribe_audio(base_video_path)
-        if not transcript_result:
-            print("❌ Failed to transcribe base video")
-            return
-        
-        segments, full_transcript = transcript_result
-        
-        # Find a suitable silent gap (longer than 1.5 seconds)
-        silent_segments = []
-        for i in range(len(segments) - 1):
-            current_end = segments[i]['end']
-            next_start = segments[i + 1]['start'] 
-            gap_duration = next_start - current_end
-            
-            if gap_duration >= 1.5:  # At least 1.5 seconds of silence
-                silent_segments.append({
-                    'start': current_end,
-                    'end': next_start,
-                    'duration': gap_duration
-                })
-        
+        # Step 4: Pick the insertion point from the silent gaps found above
         if not silent_segments:
             print("⚠️ No suitable silent segments found, using end of video")
-            # Get video duration and insert at the end
-            probe_result = subprocess.run([
-                'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-                '-of', 'csv=p=0', base_video_path
-            ], capture_output=True, text=True, check=True)
-            video_duration = float(probe_result.stdout.strip())
+            # Insert at the end (duration of the base video's audio, read with the reference)
             insert_time = video_duration - 0.5  # Insert 0.5 seconds before end
         else:
             # Use the first suitable silent segment
@@ -413,10 +361,13 @@ async def generate_progress(input_name: str, base_video_path: str):
         
         # Step 5: Generate the final video
         print("🎬 Generating final video...")
-        output_video_path = generate_video_for_name(
-            input_name, 
-            base_video_path, 
-            cloned_wav
+        output_video_path = await loop.run_in_executor(
+            None,
+            generate_video_for_name,
+            input_name,
+            base_video_path,
+            cloned_wav,
+            insert_time
         )
         
         if output_video_path and os.path.exists(output_video_path):
@@ -431,6 +382,8 @@ async def generate_progress(input_name: str, base_video_path: str):
         import traceback
         traceback.print_exc()
         return None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
 
 if __name__ == "__main__":
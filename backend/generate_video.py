@@ -1,16 +1,110 @@
-from moviepy.editor import VideoFileClip, AudioFileClip
-from pydub import AudioSegment
-from pydub.silence import detect_silence
 import os
+import subprocess
+import numpy as np
 import pandas as pd
 import glob
 import time
 
 #TTS_DIR = "cloned_voices"
 OUTPUT_DIR = "generated_videos"
+SAMPLE_RATE = 44100
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def generate_video_for_name(name: str, basevideo: str, trimmed_path : str):
+
+def decode_pcm(path: str) -> np.ndarray:
+    """Decode any audio/video file's audio to a (samples, 2) int16 array at SAMPLE_RATE via an ffmpeg pipe"""
+    pcm = subprocess.run([
+        "ffmpeg", "-v", "error", "-i", path,
+        "-vn", "-ar", str(SAMPLE_RATE), "-ac", "2", "-f", "s16le", "pipe:1"
+    ], check=True, capture_output=True).stdout
+    return np.frombuffer(pcm, dtype=np.int16).reshape(-1, 2)
+
+
+def dbfs(samples: np.ndarray) -> float:
+    """Loudness of int16-scaled samples in dBFS (same scale as pydub's AudioSegment.dBFS)"""
+    rms = np.sqrt(np.mean(np.square(samples, dtype=np.float64))) if samples.size else 0.0
+    return 20 * np.log10(rms / 32768) if rms > 0 else -np.inf
+
+
+def crossfade_concat(a: np.ndarray, b: np.ndarray, crossfade: int) -> np.ndarray:
+    """Join two (samples, channels) float arrays with a linear crossfade of `crossfade` samples"""
+    crossfade = min(crossfade, len(a), len(b))
+    if crossfade == 0:
+        return np.concatenate([a, b])
+    ramp = np.linspace(0, 1, crossfade, dtype=np.float32)[:, None]
+    mix = a[-crossfade:] * (1 - ramp) + b[:crossfade] * ramp
+    return np.concatenate([a[:-crossfade], mix, b[crossfade:]])
+
+
+def detect_silence(samples: np.ndarray, sample_rate: int, min_silence_len: int, silence_thresh: float):
+    """
+    Vectorized equivalent of pydub.silence.detect_silence (seek_step=1):
+    [start_ms, end_ms] ranges where every min_silence_len-ms window is at or below silence_thresh dBFS.
+    """
+    total_ms = int(round(1000 * len(samples) / sample_rate))
+    if total_ms < min_silence_len:
+        return []
+
+    # Energy per millisecond, then per window via a running sum
+    boundaries = (np.arange(total_ms + 1) * sample_rate // 1000).clip(max=len(samples))
+    frame_energy = np.square(samples, dtype=np.float64).sum(axis=1)
+    energy = np.concatenate(([0.0], np.cumsum(frame_energy)))[boundaries]
+    window_starts = np.arange(total_ms - min_silence_len + 1)
+    window_energy = energy[window_starts + min_silence_len] - energy[window_starts]
+    window_count = (boundaries[window_starts + min_silence_len] - boundaries[window_starts]) * samples.shape[1]
+    rms = np.sqrt(window_energy / np.maximum(window_count, 1))
+
+    silent = np.flatnonzero(rms <= 10 ** (silence_thresh / 20) * 32768)
+    if not silent.size:
+        return []
+
+    # Silent window starts closer than min_silence_len belong to the same range
+    breaks = np.flatnonzero(np.diff(silent) > min_silence_len)
+    starts = silent[np.concatenate(([0], breaks + 1))]
+    ends = silent[np.concatenate((breaks, [len(silent) - 1]))] + min_silence_len
+    return [[int(start), int(end)] for start, end in zip(starts, ends)]
+
+
+def find_silence_gaps(video_path: str, min_duration: float = 1.5):
+    """
+    Find non-speech runs of at least min_duration seconds in a video's audio track.
+    Uses WebRTC VAD on 20 ms frames of 16 kHz mono PCM piped from ffmpeg; falls back
+    to a simple energy threshold when webrtcvad is not installed.
+    Returns [{'start', 'end', 'duration'}] in seconds.
+    """
+    sample_rate = 16000
+    frame_ms = 20
+    frame_samples = sample_rate * frame_ms // 1000
+
+    pcm = subprocess.run([
+        'ffmpeg', '-v', 'error', '-i', video_path,
+        '-vn', '-ar', str(sample_rate), '-ac', '1', '-f', 's16le', 'pipe:1'
+    ], capture_output=True, check=True).stdout
+
+    frame_count = len(pcm) // (frame_samples * 2)
+    frames = np.frombuffer(pcm, dtype=np.int16, count=frame_count * frame_samples).reshape(frame_count, frame_samples)
+
+    try:
+        import webrtcvad
+        vad = webrtcvad.Vad(2)
+        speech = np.fromiter((vad.is_speech(f.tobytes(), sample_rate) for f in frames), dtype=bool, count=frame_count)
+    except ImportError:
+        print("⚠️ webrtcvad not installed, using energy-based silence detection")
+        speech = np.mean(frames.astype(np.float64) ** 2, axis=1) > 500 ** 2
+
+    # Run boundaries: pad with speech on both sides so every silent run has a start and an end
+    edges = np.diff(np.concatenate(([1], speech.astype(np.int8), [1])))
+    starts = np.flatnonzero(edges == -1) * frame_ms / 1000
+    ends = np.flatnonzero(edges == 1) * frame_ms / 1000
+    keep = ends - starts >= min_duration
+    return [
+        {'start': float(start), 'end': float(end), 'duration': float(end - start)}
+        for start, end in zip(starts[keep], ends[keep])
+    ]
+
+
+def generate_video_for_name(name: str, basevideo: str, trimmed_path : str, insert_time: float = None):
+    """Splice the cloned voice into the base video; insert_time (seconds) skips the silence search"""
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
     # # === 1. Find latest trimmed audio for this name ===
@@ -21,62 +115,65 @@ def generate_video_for_name(name: str, basevideo: str, trimmed_path : str):
     # tts_path = max(trimmed_files, key=os.path.getctime)  # latest one
     print(f"trimmed_path: {trimmed_path}")
     ##tts_path = os.path.join(trimmed_path)
-    # === 2. Load custom voice ===
-    custom_voice = AudioSegment.from_file(trimmed_path).set_channels(2).set_frame_rate(44100)
+    # === 2. Load custom voice (decoded to 44.1kHz stereo int16) ===
+    custom_voice = decode_pcm(trimmed_path).astype(np.float32)
 
-    # === 3. Load base video & audio ===
-    base_video = VideoFileClip(basevideo)
+    # === 3. Decode base audio straight into memory (video stream untouched) ===
     timestamp = int(time.time() * 1000)
-    base_audio_path = os.path.join(OUTPUT_DIR, f"{name}_original_audio_{timestamp}.mp3")
-    base_video.audio.write_audiofile(base_audio_path, fps=44100)
-
-    original_audio = AudioSegment.from_file(base_audio_path)
-
-    # === 4. Detect silence ===
-    silence_thresh = original_audio.dBFS - 16
-    silent_segments = detect_silence(original_audio, min_silence_len=500, silence_thresh=silence_thresh)
-    if not silent_segments:
-        raise Exception("No silent region found in base audio!")
-
-    silent_segments = [seg for seg in silent_segments if seg[0] > 500]
-    start_ms, _ = silent_segments[0]
-    start_ms += 500
-    print(f"Detected silent segment starting at: {start_ms}ms")
+    output_prefix = os.path.join(OUTPUT_DIR, name)
+    original_samples = decode_pcm(basevideo)
+
+    # === 4. Detect silence (unless the caller already picked the splice point) ===
+    if insert_time is not None:
+        start_ms = int(insert_time * 1000)
+        print(f"Using caller's insert point: {start_ms}ms")
+    else:
+        silence_thresh = dbfs(original_samples) - 16
+        silent_segments = detect_silence(original_samples, SAMPLE_RATE, min_silence_len=500, silence_thresh=silence_thresh)
+        if not silent_segments:
+            raise Exception("No silent region found in base audio!")
+
+        silent_segments = [seg for seg in silent_segments if seg[0] > 500]
+        start_ms, _ = silent_segments[0]
+        start_ms += 500
+        print(f"Detected silent segment starting at: {start_ms}ms")
 
     # === 5. Normalize & crossfade ===
-    target_dbfs = original_audio.dBFS
-    gain = (target_dbfs - custom_voice.dBFS) + 3
-    replacement_voice = custom_voice.apply_gain(gain)
+    original = original_samples.astype(np.float32)
+    target_dbfs = dbfs(original)
+    gain = (target_dbfs - dbfs(custom_voice)) + 3
+    replacement_voice = custom_voice * np.float32(10 ** (gain / 20))
 
     CROSSFADE_MS = 200
-    before = original_audio[:start_ms]
-    after = original_audio[start_ms + len(replacement_voice):]
-
-    modified_audio = before.append(replacement_voice, crossfade=CROSSFADE_MS)\
-                            .append(after, crossfade=CROSSFADE_MS)
-
-    # === 6. Save modified audio ===
-    final_audio_path = os.path.join(OUTPUT_DIR, f"{name}_final_audio_{timestamp}.mp3")
-    modified_audio.export(final_audio_path, format="mp3")
-
-    # === 7. Attach to video ===
-    final_audio_clip = AudioFileClip(final_audio_path)
-    final_video_path = os.path.join(OUTPUT_DIR, f"{name}_{timestamp}.mp4")
-    final_video = base_video.set_audio(final_audio_clip)
-    final_video.write_videofile(
-        final_video_path,
-        codec="libx264",
-        audio_codec="aac",
-        temp_audiofile=os.path.join(OUTPUT_DIR, f"{name}_temp_audio_{timestamp}.m4a"),
-        remove_temp=True,
-        fps=24
-    )
-
-    # === 8. Cleanup ===
-    base_video.close()
-    final_audio_clip.close()
-    os.remove(base_audio_path)
-    os.remove(final_audio_path)
+    crossfade = SAMPLE_RATE * CROSSFADE_MS // 1000
+    start = SAMPLE_RATE * start_ms // 1000
+    before = original[:start]
+    after = original[start + len(replacement_voice):]
+
+    modified_audio = crossfade_concat(crossfade_concat(before, replacement_voice, crossfade), after, crossfade)
+
+    # Each crossfade overlaps (shortens) the audio; pad back with silence to the base length so the
+    # video keeps its full duration, as the MoviePy version did
+    modified_audio = modified_audio[:len(original)]
+    if len(modified_audio) < len(original):
+        padding = np.zeros((len(original) - len(modified_audio), original.shape[1]), dtype=modified_audio.dtype)
+        modified_audio = np.concatenate([modified_audio, padding])
+
+    # === 6. Back to raw 16-bit PCM for the muxer ===
+    modified_pcm = np.clip(modified_audio, -32768, 32767).astype('<i2').tobytes()
+
+    # === 7. Attach to video (video stream copied as-is, audio piped in from memory) ===
+    final_video_path = f"{output_prefix}_{timestamp}.mp4"
+    subprocess.run([
+        "ffmpeg", "-y",
+        "-i", basevideo,
+        "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", "2", "-i", "pipe:0",
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy",
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+        final_video_path
+    ], input=modified_pcm, check=True, capture_output=True)
 
     print(f"✅ Generated video for {name}: {final_video_path}")
     print(final_video_path, flush=True)  # ✅ Ensure .NET sees it
@@ -5,7 +5,6 @@ from openvoice.api import infer_voice
 from fastapi import FastAPI, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
-import shutil
 import os
 import time
 import json
@@ -13,21 +12,13 @@ import pandas as pd
 import zipfile
 import asyncio
 import subprocess
+import concurrent.futures
 import edge_tts
 from generate_video import generate_video_for_name
+from edge_tts_pool import get_edge_connector, release_edge_connector
 
   # if you refactor API logic
 
-# For direct call via C#
-if __name__ == "__main__":
-    import sys
-    if len(sys.argv) != 2:
-        print("Usage: python generate_video.py \"Name Here\"")
-        sys.exit(1)
-
-    name = sys.argv[1]
-    asyncio.run(generate_progress(name))
-
 # === FastAPI App ===
 app = FastAPI()
 
@@ -46,6 +37,8 @@ VIDEO_DIR = "generated_videos"
 TTS_DIR = "tts"
 CLONED_DIR = "cloned_voices"
 REFERENCE_AUDIO = "voice_reference/reference.wav"
+BASE_VIDEO = "templates/base_video.mp4"
+GENERATION_CONCURRENCY = min(os.cpu_count() or 1, 4)
 LANGUAGE_VOICE = "hi-IN-MadhurNeural"
 MESSAGE_TEMPLATE = "{name}, SpeakNShare में आपका स्वागत है। मैं आपकी मदद के लिए यहां हूं।"
 
@@ -53,6 +46,23 @@ for directory in [UPLOAD_DIR, VIDEO_DIR, TTS_DIR, CLONED_DIR]:
     os.makedirs(directory, exist_ok=True)
 
 uploaded_excel = ""
+generation_task = None
+# Steps completed so far per name, filled in by generate_all
+generation_status = {}
+
+# Video assembly (decode, NumPy mix, mux) runs in worker processes so several names use several cores
+video_pool = concurrent.futures.ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) // 2))
+
+
+@app.on_event("shutdown")
+def shutdown_video_pool():
+    video_pool.shutdown(wait=True)
+
+
+# Every name is synthesized on the server's event loop, so its Edge-TTS connections live as long as the app
+@app.on_event("shutdown")
+async def shutdown_edge_connector():
+    await release_edge_connector()
 
 def extract_reference_audio(video_path: str, output_wav_path: str):
     """
@@ -62,6 +72,7 @@ def extract_reference_audio(video_path: str, output_wav_path: str):
         subprocess.run([
             "ffmpeg", "-y",
             "-i", video_path,
+            "-vn",                 # Audio only, skip video decode
             "-ar", "24000",        # 24kHz
             "-ac", "1",            # Mono
             "-c:a", "pcm_s16le",   # PCM format
@@ -73,10 +84,23 @@ def extract_reference_audio(video_path: str, output_wav_path: str):
 
 # === 1. Generate TTS Audio using Edge-TTS ===
 async def generate_tts(text: str, file_path: str):
+    """Synthesize text straight to a 24kHz mono WAV; the MP3 stream is decoded in memory by ffmpeg"""
     voice = LANGUAGE_VOICE
     try:
-        communicate = edge_tts.Communicate(text=text, voice=voice)
-        await communicate.save(file_path)
+        communicate = edge_tts.Communicate(text=text, voice=voice, connector=get_edge_connector())
+        mp3_bytes = b"".join([chunk["data"] async for chunk in communicate.stream() if chunk["type"] == "audio"])
+
+        proc = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "mp3", "-i", "pipe:0",
+            "-ar", "24000", "-ac", "1", "-c:a", "pcm_s16le",
+            file_path,
+            stdin=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await proc.communicate(mp3_bytes)
+        if proc.returncode != 0:
+            raise RuntimeError(stderr.decode(errors="replace").strip())
         print(f"✅ TTS saved: {file_path}")
     except Exception as e:
         print(f"❌ TTS generation failed: {e}")
@@ -110,16 +134,32 @@ def clone_voice(tts_wav_path: str, cloned_wav_path: str):
         print(f"❌ Voice cloning failed: {e}")
 
 # === 3. Upload Excel ===
+def write_upload(file_path, content):
+    with open(file_path, "wb") as f:
+        f.write(content)
+
+
+def read_names(excel_path):
+    df = pd.read_excel(excel_path)
+    return df["Name"].dropna().astype(str).tolist()
+
+
 @app.post("/start-generation")
-def start_generation(file: UploadFile = File(...)):
+async def start_generation(file: UploadFile = File(...)):
     global uploaded_excel
+    loop = asyncio.get_running_loop()
     file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+    content = await file.read()
+    await loop.run_in_executor(None, write_upload, file_path, content)
     uploaded_excel = file_path
 
-    df = pd.read_excel(uploaded_excel)
-    names = df["Name"].dropna().astype(str).tolist()
+    names = await loop.run_in_executor(None, read_names, uploaded_excel)
+
+    # Process the whole sheet in the background, a few names at a time
+    global generation_task
+    generation_status.clear()
+    generation_status.update({name: [] for name in names})
+    generation_task = asyncio.create_task(generate_all(names))
     return {"status": "started", "names": names}
 
 # === 4. Stream Progress (TTS + Cloning + Video) ===
@@ -159,36 +199,79 @@ def start_generation(file: UploadFile = File(...)):
 
 #     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
-async def generate_progress(name: str):
-    async def event_stream():
-        # Step 0: Ensure reference.wav is generated once
-        if not os.path.exists(REFERENCE_AUDIO):
-            extract_reference_audio("templates/base_video.mp4", REFERENCE_AUDIO)
+def ensure_reference_audio():
+    """Extract reference.wav from the base video once"""
+    if not os.path.exists(REFERENCE_AUDIO):
+        os.makedirs(os.path.dirname(REFERENCE_AUDIO), exist_ok=True)
+        extract_reference_audio(BASE_VIDEO, REFERENCE_AUDIO)
+
 
-        safe_name = name.strip().replace(" ", "_")
-        tts_mp3 = os.path.join(TTS_DIR, f"{safe_name}.mp3")
-        tts_wav = os.path.join(TTS_DIR, f"{safe_name}.wav")
-        cloned_wav = os.path.join(CLONED_DIR, f"{safe_name}.wav")
+async def run_pipeline(name: str):
+    """TTS + cloning + video for one name, yielding after each step; blocking steps run on executor threads"""
+    loop = asyncio.get_running_loop()
 
-        # Step 1: Generate TTS
-        message = MESSAGE_TEMPLATE.format(name=name)
-        await generate_tts(message, tts_mp3)
-        yield f"data: {json.dumps({'step': 'TTS Generated', 'name': name})}\n\n"
+    # Step 0: Ensure reference.wav is generated once
+    await loop.run_in_executor(None, ensure_reference_audio)
 
-        # Step 2: Convert MP3 to WAV
-        os.system(f"ffmpeg -y -i \"{tts_mp3}\" \"{tts_wav}\"")
-        yield f"data: {json.dumps({'step': 'Converted to WAV', 'name': name})}\n\n"
+    safe_name = name.strip().replace(" ", "_")
+    tts_wav = os.path.join(TTS_DIR, f"{safe_name}.wav")
+    cloned_wav = os.path.join(CLONED_DIR, f"{safe_name}.wav")
 
-        # Step 3: Clone Voice
-        clone_voice(tts_wav, cloned_wav)
-        yield f"data: {json.dumps({'step': 'Voice Cloned', 'name': name})}\n\n"
+    # Step 1: Generate TTS (Step 2, MP3 -> WAV, happens in the same ffmpeg pipe)
+    message = MESSAGE_TEMPLATE.format(name=name)
+    await generate_tts(message, tts_wav)
+    yield "TTS Generated"
+    yield "Converted to WAV"
 
-        # Step 4: Generate Final Video
-        generate_video_for_name(safe_name)
-        yield f"data: {json.dumps({'step': 'Video Generated', 'name': name})}\n\n"
+    # Step 3: Clone Voice
+    await loop.run_in_executor(None, clone_voice, tts_wav, cloned_wav)
+    yield "Voice Cloned"
+
+    # Step 4: Generate Final Video
+    await loop.run_in_executor(video_pool, generate_video_for_name, safe_name, BASE_VIDEO, cloned_wav)
+    yield "Video Generated"
+
+
+@app.get("/generate-progress")
+async def generate_progress(name: str):
+    """Stream the steps generate_all has finished for this name"""
+    if name not in generation_status:
+        return JSONResponse(status_code=404, content={"message": "Name not in the current generation"})
+
+    async def event_stream():
+        sent = 0
+        while True:
+            steps = generation_status.get(name)
+            if steps is None:
+                break  # a newer upload replaced this generation
+            for step in steps[sent:]:
+                yield f"data: {json.dumps({'step': step, 'name': name})}\n\n"
+            sent = len(steps)
+            if steps and steps[-1] in ("Video Generated", "Failed"):
+                break
+            await asyncio.sleep(0.5)
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
+
+async def generate_all(names):
+    """Run the pipeline for every name, at most GENERATION_CONCURRENCY at a time"""
+    # Extract the shared reference up front so parallel names don't race to create it
+    await asyncio.get_running_loop().run_in_executor(None, ensure_reference_audio)
+    sem = asyncio.Semaphore(GENERATION_CONCURRENCY)
+
+    async def one(name):
+        async with sem:
+            try:
+                async for step in run_pipeline(name):
+                    generation_status.setdefault(name, []).append(step)
+                    print(f"✅ {name}: {step}")
+            except Exception as e:
+                generation_status.setdefault(name, []).append("Failed")
+                print(f"❌ Generation failed for {name}: {e}")
+
+    await asyncio.gather(*(one(n) for n in names))
+
     
 
 # === 5. Download Individual Video ===
@@ -232,4 +315,29 @@ def whatsapp_link_all():
             links.append(f"📹 {name}: {link}")
     message = "\n".join(links)
     wa_url = f"https://wa.me/?text={message}"
-    return {"url": wa_url}
\ No newline at end of file
+    return {"url": wa_url}
+
+
+# For direct call via C# (kept at the bottom so every function above is defined)
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python main.py \"Name Here\"")
+        sys.exit(1)
+
+    name = sys.argv[1]
+
+    async def run_cli():
+        try:
+            async for step in run_pipeline(name):
+                print(f"✅ {name}: {step}", flush=True)
+        finally:
+            await release_edge_connector()
+
+    # One loop for the whole run, reused by every awaited step
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(run_cli())
+    finally:
+        video_pool.shutdown(wait=True)
+        loop.close()
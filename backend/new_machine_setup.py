@@ -7,8 +7,36 @@ Complete setup script for new machine - fixes both issues:
 
 import os
 import sys
+import json
 import subprocess
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from setup_utils import atomic_write, try_import
+
+def _probe_duration(path):
+    """ffprobe duration, cached in a <path>.dur.json sidecar keyed by mtime and size"""
+    key = f"{os.path.getmtime(path)}:{os.path.getsize(path)}"
+    sidecar = path + ".dur.json"
+    try:
+        with open(sidecar, 'r') as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            return cached["duration"]
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    result = subprocess.run([
+        'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
+        '-of', 'csv=p=0', path
+    ], capture_output=True, text=True, check=True)
+    duration = float(result.stdout.strip())
+    
+    try:
+        with open(sidecar, 'w') as f:
+            json.dump({"key": key, "duration": duration}, f)
+    except OSError:
+        pass
+    return duration
 
 def main():
     print("🔧 NEW MACHINE SETUP - Fixing known issues")
@@ -25,10 +53,9 @@ def main():
     
     # Step 2: Check FFmpeg
     print("\n2️⃣ Checking FFmpeg...")
-    try:
-        result = subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
+    if shutil.which("ffmpeg"):
         print("✅ FFmpeg found")
-    except:
+    else:
         print("❌ FFmpeg not found!")
         print("Please install FFmpeg first:")
         print("- Windows: Download from https://www.gyan.dev/ffmpeg/builds/")
@@ -45,56 +72,50 @@ def main():
         sys.exit(1)
     
     # Check video duration
-    try:
-        result = subprocess.run([
-            'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-            '-of', 'csv=p=0', template_path
-        ], capture_output=True, text=True, check=True)
-        
-        duration = float(result.stdout.strip())
-        print(f"📹 Template duration: {duration:.2f} seconds")
+    if not shutil.which("ffprobe"):
+        print("⚠️ ffprobe not found, skipping template duration check")
+    else:
+        try:
+            duration = _probe_duration(template_path)
+            print(f"📹 Template duration: {duration:.2f} seconds")
         
-        if duration < 10.0:
-            print(f"⚠️ Template video is short ({duration:.2f}s)")
-            print("🔄 Creating extended template...")
+            if duration < 10.0:
+                print(f"⚠️ Template video is short ({duration:.2f}s)")
+                print("🔄 Creating extended template...")
             
-            extended_path = "templates/as_extended.mp4"
-            loop_count = int(15.0 / duration) + 1
+                extended_path = "templates/as_extended.mp4"
             
-            subprocess.run([
-                'ffmpeg', '-y', '-stream_loop', str(loop_count-1),
-                '-i', template_path, '-t', '15',
-                '-c', 'copy', extended_path
-            ], check=True)
+                subprocess.run([
+                    'ffmpeg', '-y', '-stream_loop', '-1',
+                    '-i', template_path, '-t', '15',
+                    '-c', 'copy', extended_path
+                ], check=True)
             
-            print(f"✅ Extended template created: {extended_path}")
-            print("💡 Use 'templates/as_extended.mp4' for better results")
-        else:
-            print("✅ Template video duration is good")
+                print(f"✅ Extended template created: {extended_path}")
+                print("💡 Use 'templates/as_extended.mp4' for better results")
+            else:
+                print("✅ Template video duration is good")
             
-    except Exception as e:
-        print(f"⚠️ Could not check video duration: {e}")
+        except Exception as e:
+            print(f"⚠️ Could not check video duration: {e}")
     
     # Step 4: Setup OpenVoice directories
     print("\n4️⃣ Setting up OpenVoice structure...")
     
-    openvoice_dirs = [
-        "openvoice",
-        "openvoice/checkpoints",
-        "openvoice/checkpoints/base_speakers",
+    # Leaves only; makedirs creates the parents
+    openvoice_dirs = sorted({
         "openvoice/checkpoints/base_speakers/EN",
-        "openvoice/checkpoints/converter", 
-        "openvoice/models",
-        "openvoice/hf_home"
-    ]
+        "openvoice/checkpoints/converter"
+    })
     
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        list(ex.map(lambda d: os.makedirs(d, exist_ok=True), openvoice_dirs))
     for directory in openvoice_dirs:
-        os.makedirs(directory, exist_ok=True)
         print(f"📁 Created: {directory}")
     
     print("✅ OpenVoice directories created")
     
-    # Step 5: Set up environment variables
+    # Step 5: Set up environment variables (an importable, idempotent module)
     print("\n5️⃣ Setting up OpenVoice environment...")
     
     # Create environment setup file
@@ -102,67 +123,29 @@ def main():
 # OpenVoice Environment Setup
 import os
 
-# Set HuggingFace cache locations
-os.environ["HF_HUB_CACHE"] = os.path.abspath("openvoice/models")
-os.environ["HF_HOME"] = os.path.abspath("openvoice/hf_home") 
-os.environ["TRANSFORMERS_CACHE"] = os.path.abspath("openvoice/models/transformers")
+# Shared HuggingFace cache (hub and transformers both derive from HF_HOME); an existing HF_HOME wins
+os.environ.setdefault("HF_HOME", os.path.expanduser("~/.cache/huggingface"))
 
-# SSL bypass for corporate networks
-os.environ["CURL_CA_BUNDLE"] = ""
-os.environ["REQUESTS_CA_BUNDLE"] = ""
-os.environ["SSL_VERIFY"] = "0"
-os.environ["PYTHONHTTPSVERIFY"] = "0"
+# SSL bypass for corporate networks (setdefault: importing twice or inheriting is harmless)
+os.environ.setdefault("CURL_CA_BUNDLE", "")
+os.environ.setdefault("REQUESTS_CA_BUNDLE", "")
+os.environ.setdefault("SSL_VERIFY", "0")
+os.environ.setdefault("PYTHONHTTPSVERIFY", "0")
 
 print("🌐 OpenVoice environment configured")
 '''
     
-    with open("openvoice_env_setup.py", "w") as f:
-        f.write(env_setup)
+    atomic_write("openvoice_env.py", env_setup)
     
-    print("✅ Created openvoice_env_setup.py")
+    print("✅ Created openvoice_env.py")
     
     # Step 6: Test basic functionality
     print("\n6️⃣ Testing basic setup...")
     
-    try:
-        # Import test
-        print("🧪 Testing imports...")
-        test_imports = '''
-try:
-    import edge_tts
-    print("✅ edge_tts imported")
-except ImportError as e:
-    print(f"❌ edge_tts import failed: {e}")
-
-try:
-    import pyttsx3  
-    print("✅ pyttsx3 imported")
-except ImportError as e:
-    print(f"❌ pyttsx3 import failed: {e}")
-
-try:
-    from moviepy.editor import VideoFileClip
-    print("✅ moviepy imported")
-except ImportError as e:
-    print(f"❌ moviepy import failed: {e}")
-
-try:
-    import torch
-    print("✅ torch imported")
-except ImportError as e:
-    print(f"❌ torch import failed: {e}")
-'''
-        
-        result = subprocess.run([
-            sys.executable, "-c", test_imports
-        ], capture_output=True, text=True, timeout=30)
-        
-        print(result.stdout)
-        if result.stderr:
-            print(f"Import warnings: {result.stderr}")
-            
-    except Exception as e:
-        print(f"⚠️ Import test failed: {e}")
+    # Import test, in this process
+    print("🧪 Testing imports...")
+    for module in ["edge_tts", "pyttsx3", "moviepy.editor", "torch"]:
+        try_import(module)
     
     # Step 7: Create test script
     print("\n7️⃣ Creating test script...")
@@ -173,11 +156,9 @@ except ImportError as e:
 import os
 import sys
 
-# Load OpenVoice environment
-exec(open('openvoice_env_setup.py').read())
-
-# Import main function
+# Load OpenVoice environment once; generate.py below inherits it through os.environ
 sys.path.append('.')
+import openvoice_env
 
 def test_generation():
     """Test video generation with extended template"""
@@ -203,8 +184,7 @@ if __name__ == "__main__":
         print("❌ Test failed - check output above")
 '''
     
-    with open("test_setup.py", "w") as f:
-        f.write(test_script)
+    atomic_write("test_setup.py", test_script)
     
     print("✅ Created test_setup.py")
     
@@ -225,7 +205,7 @@ if __name__ == "__main__":
     print("✅ Video duration validation and extension")  
     print("✅ OpenVoice directory structure created")
     print("✅ Environment variables configured")
-    print("✅ Model cache directories prepared")
+    print("✅ Shared HuggingFace cache configured")
     print("✅ SSL bypass for corporate networks")
     
     print("\n🌐 OpenVoice Models:")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Persistent OpenVoice worker.
+
+Loads the OpenVoice base speaker TTS and tone color converter once, then
+serves jobs read as one JSON object per line on stdin, answering each with
+one JSON line on stdout:
+
+    {"op": "tts", "text": ..., "tgt": <reference wav>, "out": <output wav>}
+    {"op": "clone", "src": <source wav>, "tgt": <reference wav>, "out": <output wav>}
+    {"op": "clone_batch", "tgt": <reference wav>, "items": [{"src": ..., "out": ...}, ...]}
+
+Usage: python openvoice_worker.py <openvoice_dir>
+
+The worker exits at end of input, so a single job can also be run one-shot:
+
+    subprocess.run([sys.executable, "openvoice_worker.py", openvoice_dir],
+                   input=json.dumps(job) + "\n", capture_output=True, text=True)
+
+Job data never becomes Python source, so paths and text need no escaping.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import sys
+
+SE_CACHE_DIR = "se_cache"
+
+# Keep stdout for the JSON protocol; library chatter goes to stderr
+_protocol_out = sys.stdout
+sys.stdout = sys.stderr
+
+
+def load_models(openvoice_dir: str):
+    """Load the OpenVoice models once for the lifetime of the worker"""
+    sys.path.insert(0, openvoice_dir)
+    import torch
+    from api import BaseSpeakerTTS, ToneColorConverter
+    import se_extractor
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"🖥️ OpenVoice worker using device: {device}")
+
+    base_speaker_dir = os.path.join(openvoice_dir, "checkpoints", "base_speakers", "EN")
+    converter_dir = os.path.join(openvoice_dir, "checkpoints", "converter")
+
+    base_speaker_tts = BaseSpeakerTTS(os.path.join(base_speaker_dir, "config.json"), device=device)
+    base_speaker_tts.load_ckpt(os.path.join(base_speaker_dir, "checkpoint.pth"))
+
+    converter = ToneColorConverter(os.path.join(converter_dir, "config.json"), device=device)
+    converter.load_ckpt(os.path.join(converter_dir, "checkpoint.pth"))
+    if device == "cuda":
+        # Half-precision weights: half the VRAM and memory traffic; CPU stays FP32
+        converter.model = converter.model.half()
+
+    default_se = torch.load(os.path.join(base_speaker_dir, "en_default_se.pth")).to(device)
+
+    return {
+        "torch": torch,
+        "device": device,
+        "base_speaker_tts": base_speaker_tts,
+        "converter": converter,
+        "se_extractor": se_extractor,
+        "default_se": default_se,
+    }
+
+
+def inference_context(models):
+    """FP16 autocast on CUDA, plain FP32 on CPU"""
+    if models["device"] == "cuda":
+        return models["torch"].autocast("cuda", dtype=models["torch"].float16)
+    return contextlib.nullcontext()
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_target_se(models, reference_wav_path: str):
+    """
+    Speaker embedding of a reference recording, cached on disk by audio hash.
+    Every name generated from the same base video reuses one extraction.
+    """
+    torch = models["torch"]
+    cache_path = os.path.join(SE_CACHE_DIR, f"{file_sha256(reference_wav_path)}.pt")
+    if os.path.exists(cache_path):
+        return torch.load(cache_path, map_location=models["device"])
+
+    with inference_context(models):
+        target_se, _ = models["se_extractor"].get_se(
+            reference_wav_path, models["converter"], target_dir="temp", vad=True
+        )
+    os.makedirs(SE_CACHE_DIR, exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    torch.save(target_se, tmp_path)
+    os.replace(tmp_path, cache_path)
+    return target_se
+
+
+def run_tts(models, job):
+    """Synthesize text with the base speaker, then convert it to the reference voice"""
+    base_output = job["out"].replace(".wav", "_base.wav")
+    models["base_speaker_tts"].tts(job["text"], base_output, speaker="default", language="English")
+    try:
+        tgt_se = get_target_se(models, job["tgt"])
+        with inference_context(models):
+            models["converter"].convert(
+                audio_src_path=base_output,
+                src_se=models["default_se"],
+                tgt_se=tgt_se,
+                output_path=job["out"],
+            )
+    finally:
+        if os.path.exists(base_output):
+            os.remove(base_output)
+
+
+def run_clone(models, job):
+    """Convert an existing recording to the reference voice"""
+    tgt_se = get_target_se(models, job["tgt"])
+    with inference_context(models):
+        source_se, _ = models["se_extractor"].get_se(job["src"], models["converter"], target_dir="temp", vad=True)
+        models["converter"].convert(
+            audio_src_path=job["src"],
+            src_se=source_se,
+            tgt_se=tgt_se,
+            output_path=job["out"],
+            message="Voice conversion",
+        )
+
+
+def run_clone_batch(models, job):
+    """
+    Convert several recordings to one reference voice in a single forward pass.
+    Spectrograms are zero-padded to a common length and trimmed again per item.
+    """
+    import librosa
+    import soundfile
+    from mel_processing import spectrogram_torch
+
+    torch = models["torch"]
+    converter = models["converter"]
+    hps = converter.hps
+    device = models["device"]
+    tgt_se = get_target_se(models, job["tgt"])
+
+    ok = [False] * len(job["items"])
+    batch = []  # (index, spec, source_se)
+    for i, item in enumerate(job["items"]):
+        try:
+            with inference_context(models):
+                source_se, _ = models["se_extractor"].get_se(item["src"], converter, target_dir="temp", vad=True)
+            audio, _ = librosa.load(item["src"], sr=hps.data.sampling_rate)
+            y = torch.FloatTensor(audio).to(device).unsqueeze(0)
+            spec = spectrogram_torch(
+                y, hps.data.filter_length, hps.data.sampling_rate,
+                hps.data.hop_length, hps.data.win_length, center=False
+            )
+            batch.append((i, spec[0], source_se))
+        except Exception as e:
+            print(f"❌ Skipping {item['src']}: {e}")
+
+    if batch:
+        with torch.no_grad(), inference_context(models):
+            lengths = [spec.size(-1) for _, spec, _ in batch]
+            specs = torch.zeros(len(batch), batch[0][1].size(0), max(lengths), device=device)
+            for row, (_, spec, _) in enumerate(batch):
+                specs[row, :, :spec.size(-1)] = spec
+            sid_src = torch.cat([se for _, _, se in batch], dim=0)
+            sid_tgt = tgt_se.expand(len(batch), -1, -1)
+            audio = converter.model.voice_conversion(
+                specs, torch.LongTensor(lengths).to(device), sid_src=sid_src, sid_tgt=sid_tgt, tau=0.3
+            )[0]
+
+        for row, (i, _, _) in enumerate(batch):
+            samples = audio[row, 0, :lengths[row] * hps.data.hop_length].data.cpu().float().numpy()
+            samples = converter.add_watermark(samples, "Voice conversion")
+            soundfile.write(job["items"][i]["out"], samples, hps.data.sampling_rate)
+            ok[i] = True
+
+    return {"results": ok}
+
+
+HANDLERS = {
+    "tts": run_tts,
+    "clone": run_clone,
+    "clone_batch": run_clone_batch,
+}
+
+
+def reply(payload):
+    _protocol_out.write(json.dumps(payload) + "\n")
+    _protocol_out.flush()
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python openvoice_worker.py <openvoice_dir>")
+        sys.exit(1)
+
+    models = load_models(sys.argv[1])
+    print("✅ OpenVoice worker ready")
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+            extra = HANDLERS[job["op"]](models, job) or {}
+            reply({"ok": True, "out": job.get("out"), **extra})
+        except Exception as e:
+            reply({"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+
+if __name__ == "__main__":
+    main()
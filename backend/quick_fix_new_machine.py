@@ -4,81 +4,81 @@ Quick update script for new machine - adds audio extension fix if missing
 """
 
 import os
+import re
 import sys
 import shutil
 from pathlib import Path
+from setup_utils import atomic_write
 
-def update_generate_py():
-    """Update generate.py with audio extension fix if it's missing"""
+# The OpenVoice cloning log line, tolerant of surrounding whitespace drift
+CLONING_PRINT = re.compile(r'print\(\s*"🧬 Attempting OpenVoice cloning\.\.\."\s*\)')
+
+def patch_generate_py():
+    """Add the audio extension fix to generate.py in one read, one backup and one write"""
     print("🔧 Updating generate.py with audio extension fix...")
     
     if not os.path.exists('generate.py'):
         print("❌ generate.py not found")
         return False
     
-    # Read current file
+    # Read current file once
     with open('generate.py', 'r', encoding='utf-8') as f:
         content = f.read()
+    original = content
     
-    # Check if we already have the fix
-    if 'def extend_short_audio(' in content:
-        print("✅ extend_short_audio function already exists")
-        return True
-    
-    # Add the extend_short_audio function if missing
     extend_function = '''
+def _probe_duration(path: str) -> float:
+    """ffprobe duration, cached in a <path>.dur.json sidecar keyed by mtime and size"""
+    import json
+    import subprocess
+    
+    key = f"{os.path.getmtime(path)}:{os.path.getsize(path)}"
+    sidecar = path + ".dur.json"
+    try:
+        with open(sidecar, 'r') as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            return cached["duration"]
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    result = subprocess.run([
+        'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
+        '-of', 'csv=p=0', path
+    ], capture_output=True, text=True, check=True)
+    duration = float(result.stdout.strip())
+    
+    try:
+        with open(sidecar, 'w') as f:
+            json.dump({"key": key, "duration": duration}, f)
+    except OSError:
+        pass
+    return duration
+
 def extend_short_audio(audio_path: str, min_duration: float = 3.0) -> str:
     """Extend audio file if it's too short for voice cloning"""
     try:
         import subprocess
-        import tempfile
-        
-        # Get audio duration
-        result = subprocess.run([
-            'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-            '-of', 'csv=p=0', audio_path
-        ], capture_output=True, text=True, check=True)
         
-        duration = float(result.stdout.strip())
+        # Get audio duration (cached across runs while the file is unchanged)
+        duration = _probe_duration(audio_path)
         print(f"🕒 Audio duration: {duration:.2f}s")
         
         if duration < min_duration:
             print(f"⚡ Extending short audio from {duration:.2f}s to {min_duration:.2f}s")
             
-            # Calculate how many times to repeat
-            repeat_count = int((min_duration / duration) + 1)
-            
             # Create the extended audio file
             base_name = os.path.splitext(audio_path)[0]
             extended_path = f"{base_name}_extended.wav"
             
-            # Use FFmpeg to concatenate the audio file with itself
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-                for _ in range(repeat_count):
-                    f.write(f"file '{os.path.abspath(audio_path)}'\\n")
-                concat_file = f.name
+            # Loop, decode and write cloning-ready WAV (22.05kHz mono PCM) in a single ffmpeg pass
+            subprocess.run([
+                'ffmpeg', '-y', '-stream_loop', '-1', '-i', audio_path,
+                '-t', str(min_duration), '-ac', '1', '-ar', '22050', '-c:a', 'pcm_s16le', extended_path
+            ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             
-            try:
-                subprocess.run([
-                    'ffmpeg', '-y', '-f', 'concat', '-safe', '0',
-                    '-i', concat_file, '-t', str(min_duration),
-                    '-acodec', 'copy', extended_path
-                ], check=True, capture_output=True)
-                
-                os.unlink(concat_file)
-                print(f"✅ Extended audio saved: {extended_path}")
-                return extended_path
-                
-            except subprocess.CalledProcessError as e:
-                # Fallback: use simple repeat with silence padding
-                subprocess.run([
-                    'ffmpeg', '-y', '-i', audio_path,
-                    '-filter_complex', f'[0:a]aloop=loop={repeat_count-1}:size=44100*{min_duration}[out]',
-                    '-map', '[out]', '-t', str(min_duration), extended_path
-                ], check=True, capture_output=True)
-                
-                print(f"✅ Extended audio with loop: {extended_path}")
-                return extended_path
+            print(f"✅ Extended audio saved: {extended_path}")
+            return extended_path
         else:
             return audio_path
             
@@ -87,11 +87,13 @@ def extend_short_audio(audio_path: str, min_duration: float = 3.0) -> str:
         return audio_path
 '''
     
-    # Find the location to insert the function (before clone_voice function)
-    if 'def clone_voice(' in content:
-        # Insert before clone_voice function
+    # 1. Add the extend_short_audio function if missing (before clone_voice function)
+    if 'def extend_short_audio(' in content:
+        print("✅ extend_short_audio function already exists")
+    elif 'def clone_voice(' in content:
         parts = content.split('def clone_voice(', 1)
-        new_content = parts[0] + extend_function + '\n\ndef clone_voice(' + parts[1]
+        content = parts[0] + extend_function + '\n\ndef clone_voice(' + parts[1]
+        print("✅ Added extend_short_audio function")
     else:
         # Add at the end of imports section
         lines = content.split('\n')
@@ -101,34 +103,15 @@ def extend_short_audio(audio_path: str, min_duration: float = 3.0) -> str:
                 insert_pos = i + 1
         
         lines.insert(insert_pos + 1, extend_function)
-        new_content = '\n'.join(lines)
-    
-    # Backup original file
-    shutil.copy2('generate.py', 'generate.py.backup')
-    
-    # Write updated content
-    with open('generate.py', 'w', encoding='utf-8') as f:
-        f.write(new_content)
+        content = '\n'.join(lines)
+        print("✅ Added extend_short_audio function")
     
-    print("✅ Added extend_short_audio function to generate.py")
-    print("💾 Original backed up as generate.py.backup")
-    return True
-
-def update_openvoice_call():
-    """Update the OpenVoice call to use audio extension"""
-    print("🔧 Updating OpenVoice call to use audio extension...")
-    
-    with open('generate.py', 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Check if already updated
+    # 2. Update the OpenVoice call to use audio extension
+    call_updated = True
     if 'Pre-processing audio files' in content:
         print("✅ OpenVoice call already updated")
-        return True
-    
-    # Find and replace the OpenVoice section
-    old_pattern = '''print("🧬 Attempting OpenVoice cloning...")'''
-    new_pattern = '''print("🧬 Attempting OpenVoice cloning...")
+    else:
+        new_pattern = '''print("🧬 Attempting OpenVoice cloning...")
             
             # ALWAYS extend audio files to prevent "too short" errors
             print("⚡ Pre-processing audio files...")
@@ -137,29 +120,29 @@ def update_openvoice_call():
             
             print(f"📥 Using TTS audio: {extended_tts}")
             print(f"📥 Using reference audio: {extended_ref}")'''
-    
-    if old_pattern in content:
-        # Replace the pattern
-        content = content.replace(old_pattern, new_pattern)
         
-        # Also update the subprocess call to use extended files
-        content = content.replace(
-            '"-i", tts_wav_path,',
-            '"-i", extended_tts,'
-        ).replace(
-            '"-r", reference_wav_path,',
-            '"-r", extended_ref,'
-        )
-        
-        # Write updated content
-        with open('generate.py', 'w', encoding='utf-8') as f:
-            f.write(content)
-        
-        print("✅ Updated OpenVoice call to use extended audio")
-        return True
-    else:
-        print("⚠️ Could not find OpenVoice call pattern to update")
-        return False
+        content, found = CLONING_PRINT.subn(lambda _: new_pattern, content, count=1)
+        if found:
+            # Also update the subprocess call to use extended files
+            content = content.replace(
+                '"-i", tts_wav_path,',
+                '"-i", extended_tts,'
+            ).replace(
+                '"-r", reference_wav_path,',
+                '"-r", extended_ref,'
+            )
+            print("✅ Updated OpenVoice call to use extended audio")
+        else:
+            print("⚠️ Could not find OpenVoice call pattern to update")
+            call_updated = False
+    
+    # 3. Backup and write once, only if both edits apply (never leave a half-patched file)
+    if call_updated and content != original:
+        shutil.copy2('generate.py', 'generate.py.backup')
+        atomic_write('generate.py', content)
+        print("💾 Original backed up as generate.py.backup")
+    
+    return call_updated
 
 def main():
     print("🚀 Quick Fix for New Machine - Audio Extension")
@@ -173,15 +156,13 @@ def main():
     print(f"📁 Working in: {os.getcwd()}")
     
     # Update the file
-    func_added = update_generate_py()
-    call_updated = update_openvoice_call()
+    patched = patch_generate_py()
     
     print("\n" + "=" * 55)
     print("📋 Update Summary:")
-    print(f"   🔧 extend_short_audio function: {'✅ Added' if func_added else '❌ Failed'}")
-    print(f"   🔧 OpenVoice call updated: {'✅ Updated' if call_updated else '❌ Failed'}")
+    print(f"   🔧 generate.py audio extension fix: {'✅ Applied' if patched else '❌ Failed'}")
     
-    if func_added and call_updated:
+    if patched:
         print("\n🎉 Audio extension fix applied successfully!")
         print("\n🎯 Test the fix:")
         print("   python generate.py \"Test Name\" \"templates/as.mp4\"")
@@ -6,101 +6,150 @@ This script downloads and sets up all required OpenVoice models and checkpoints
 
 import os
 import sys
-import subprocess
-import urllib.request
+import fnmatch
+import importlib
+import importlib.util
 import zipfile
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from setup_utils import atomic_write, try_import
+
+# Rust multi-connection downloader for HF files, when installed (setup_openvoice.py installs it)
+if importlib.util.find_spec("hf_transfer") is not None:
+    os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+
+# Shared user-wide HF cache (overridable via HF_HOME / HF_HUB_CACHE) so other tools reuse the same blobs
+HF_HOME = os.environ.get("HF_HOME", os.path.expanduser("~/.cache/huggingface"))
+HF_HUB_CACHE = os.environ.get("HF_HUB_CACHE", os.path.join(HF_HOME, "hub"))
+
+OPENVOICE_REPO_ID = "myshell-ai/OpenVoice"
+CHECKPOINT_PATTERNS = [
+    "checkpoints/base_speakers/EN/*.json",
+    "checkpoints/base_speakers/EN/*.pth",
+    "checkpoints/converter/*.json",
+    "checkpoints/converter/*.pth",
+]
 
 def setup_directories():
-    """Create necessary directories"""
-    directories = [
-        'openvoice',
-        'openvoice/checkpoints',
-        'openvoice/checkpoints/base_speakers',
+    """Create necessary directories (leaves only; makedirs creates the parents)"""
+    directories = sorted({
         'openvoice/checkpoints/base_speakers/EN',
         'openvoice/checkpoints/converter',
         'openvoice/cache',
-        'openvoice/hf_cache',
         'openvoice/torch_cache'
-    ]
+    })
     
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        list(ex.map(lambda d: os.makedirs(d, exist_ok=True), directories))
     for dir_path in directories:
-        os.makedirs(dir_path, exist_ok=True)
         print(f"✅ Created directory: {dir_path}")
 
-def download_file(url, destination, description):
-    """Download a file with progress indication"""
+def link_snapshot_files(snapshot_dir, destination_root):
+    """Hard-link (or copy) downloaded snapshot files into destination_root, keeping one copy on disk"""
+    for root, _, files in os.walk(snapshot_dir):
+        for name in files:
+            source = os.path.realpath(os.path.join(root, name))
+            destination = os.path.join(destination_root, os.path.relpath(os.path.join(root, name), snapshot_dir))
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            if os.path.exists(destination):
+                if os.path.samefile(source, destination):
+                    continue
+                os.remove(destination)
+            try:
+                os.link(source, destination)
+            except OSError:
+                shutil.copy2(source, destination)
+
+def missing_checkpoint_files(destination_root="openvoice"):
+    """
+    Checkpoint files whose local copy is absent or differs in size from the Hub listing.
+    Returns None when the listing can't be fetched, so the caller falls back to a full snapshot check.
+    """
     try:
-        print(f"📥 Downloading {description}...")
-        urllib.request.urlretrieve(url, destination)
-        print(f"✅ Downloaded: {destination}")
-        return True
+        from huggingface_hub import HfApi
+        info = HfApi().model_info(OPENVOICE_REPO_ID, files_metadata=True)
     except Exception as e:
-        print(f"❌ Failed to download {description}: {e}")
-        return False
+        print(f"⚠️ Could not list {OPENVOICE_REPO_ID} files: {e}")
+        return None
+    
+    missing = []
+    for sibling in info.siblings:
+        if not any(fnmatch.fnmatch(sibling.rfilename, pattern) for pattern in CHECKPOINT_PATTERNS):
+            continue
+        destination = os.path.join(destination_root, sibling.rfilename)
+        if os.path.exists(destination) and os.path.getsize(destination) == sibling.size:
+            print(f"⏭️ Already present: {destination}")
+        else:
+            missing.append(sibling.rfilename)
+    return missing
 
 def setup_openvoice_checkpoints():
-    """Download and set up OpenVoice checkpoints"""
+    """Download the OpenVoice checkpoints in one parallel, resumable snapshot"""
     print("🔧 Setting up OpenVoice checkpoints...")
     
-    # Base checkpoint URLs (these are example URLs - you'll need the actual ones)
-    checkpoints = {
-        'converter/config.json': 'https://huggingface.co/myshell-ai/OpenVoice/resolve/main/checkpoints/converter/config.json',
-        'converter/checkpoint.pth': 'https://huggingface.co/myshell-ai/OpenVoice/resolve/main/checkpoints/converter/checkpoint.pth',
-        'base_speakers/EN/config.json': 'https://huggingface.co/myshell-ai/OpenVoice/resolve/main/checkpoints/base_speakers/EN/config.json',
-        'base_speakers/EN/checkpoint.pth': 'https://huggingface.co/myshell-ai/OpenVoice/resolve/main/checkpoints/base_speakers/EN/checkpoint.pth',
-    }
-    
-    success_count = 0
-    for path, url in checkpoints.items():
-        destination = f"openvoice/checkpoints/{path}"
-        os.makedirs(os.path.dirname(destination), exist_ok=True)
-        
-        if download_file(url, destination, f"checkpoint {path}"):
-            success_count += 1
+    try:
+        from huggingface_hub import snapshot_download
+        from huggingface_hub.utils import HfHubHTTPError
+    except ImportError as e:
+        print(f"❌ huggingface_hub not installed: {e}")
+        return False
+    
+    missing = missing_checkpoint_files()
+    if missing == []:
+        print("✅ All checkpoints already present, skipping download")
+        return True
     
-    return success_count == len(checkpoints)
+    try:
+        print(f"📥 Downloading checkpoints from {OPENVOICE_REPO_ID}...")
+        snapshot_dir = snapshot_download(
+            repo_id=OPENVOICE_REPO_ID,
+            allow_patterns=CHECKPOINT_PATTERNS,
+            cache_dir=HF_HUB_CACHE,
+            max_workers=8
+        )
+        link_snapshot_files(snapshot_dir, "openvoice")
+        print("✅ Checkpoints downloaded to openvoice/checkpoints")
+        return True
+    except HfHubHTTPError as e:
+        print(f"❌ Failed to download checkpoints: {e}")
+        return False
 
 def setup_huggingface_cache():
     """Set up HuggingFace cache for offline mode"""
     print("🔧 Setting up HuggingFace cache...")
     
-    # Set environment variables for cache
-    cache_dir = os.path.abspath("openvoice/hf_cache")
-    os.environ['HF_HOME'] = cache_dir
-    os.environ['TRANSFORMERS_CACHE'] = cache_dir
+    # Shared cache; transformers derives its own location from HF_HOME
+    cache_dir = HF_HUB_CACHE
+    os.environ.setdefault('HF_HOME', HF_HOME)
     
     try:
-        # Try to download required models
-        subprocess.run([
-            sys.executable, "-c", """
-import os
-os.environ['HF_HOME'] = 'openvoice/hf_cache'
-os.environ['TRANSFORMERS_CACHE'] = 'openvoice/hf_cache'
-
-try:
-    from huggingface_hub import hf_hub_download
-    
-    # Download WavMark model
-    hf_hub_download(
-        repo_id="M4869/WavMark",
-        filename="step59000_snr39.99_pesq4.35_BERP_none0.30_mean1.81_std1.81.model.pkl",
-        cache_dir="openvoice/hf_cache"
-    )
-    print("✅ WavMark model downloaded")
-    
-except Exception as e:
-    print(f"⚠️ HuggingFace cache setup failed: {e}")
-    print("Will try to download models on first run")
-"""
-        ], check=False, timeout=300)
+        from huggingface_hub import hf_hub_download
+        from huggingface_hub.utils import HfHubHTTPError
+        
+        # Download WavMark model in-process (tqdm progress bar); retry transient 429/5xx errors
+        for attempt in range(3):
+            try:
+                hf_hub_download(
+                    repo_id="M4869/WavMark",
+                    filename="step59000_snr39.99_pesq4.35_BERP_none0.30_mean1.81_std1.81.model.pkl",
+                    cache_dir=cache_dir
+                )
+                break
+            except HfHubHTTPError as e:
+                if attempt == 2:
+                    raise
+                print(f"⚠️ WavMark download failed ({e}), retrying...")
+                time.sleep(2 ** attempt)
+        print("✅ WavMark model downloaded")
         
         print("✅ HuggingFace cache setup completed")
         return True
         
     except Exception as e:
         print(f"⚠️ HuggingFace cache setup failed: {e}")
+        print("Will try to download models on first run")
         return False
 
 def create_openvoice_cli_config():
@@ -122,8 +171,7 @@ print(f"OpenVoice device: {DEVICE}")
 print(f"Checkpoints directory: {CHECKPOINTS_DIR}")
 """
     
-    with open('openvoice/openvoice_cli.py', 'w') as f:
-        f.write(config_content)
+    atomic_write('openvoice/openvoice_cli.py', config_content)
     
     print("✅ Created OpenVoice CLI configuration")
 
@@ -131,16 +179,12 @@ def test_openvoice_setup():
     """Test if OpenVoice setup is working"""
     print("🧪 Testing OpenVoice setup...")
     
-    try:
-        # Test OpenVoice CLI import
-        result = subprocess.run([
-            sys.executable, "-c", """
-try:
-    import openvoice_cli
-    print("✅ OpenVoice CLI import successful")
+    # Test OpenVoice CLI import (the generated config lives in openvoice/)
+    importlib.invalidate_caches()
+    sys.path.insert(0, os.path.abspath("openvoice"))
+    cli_ok = try_import("openvoice_cli")
     
     # Test checkpoint paths
-    import os
     checkpoints_exist = all([
         os.path.exists('openvoice/checkpoints/converter/config.json'),
         os.path.exists('openvoice/checkpoints/base_speakers/EN/config.json')
@@ -150,21 +194,8 @@ try:
         print("✅ Checkpoint files found")
     else:
         print("⚠️ Some checkpoint files missing")
-        
-except Exception as e:
-    print(f"❌ OpenVoice test failed: {e}")
-"""
-        ], capture_output=True, text=True, timeout=30)
-        
-        print(result.stdout)
-        if result.stderr:
-            print(f"Stderr: {result.stderr}")
-            
-        return result.returncode == 0
-        
-    except Exception as e:
-        print(f"❌ OpenVoice test failed: {e}")
-        return False
+    
+    return cli_ok
 
 def main():
     """Main setup function"""
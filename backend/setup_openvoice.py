@@ -8,24 +8,44 @@ Run this on a machine with internet access to download all required models.
 import os
 import sys
 import subprocess
+import importlib
 import shutil
+import shlex
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from setup_utils import atomic_write, try_import
 
 def run_command(command, description, check=True):
-    """Run a command and print status"""
+    """Run a command (argument list or string) without a shell, streaming its output live, and print status"""
     print(f"🔄 {description}...")
+    args = command if isinstance(command, list) else shlex.split(command)
     try:
-        result = subprocess.run(command, shell=True, check=check, capture_output=True, text=True)
-        if result.returncode == 0:
+        proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+        for line in proc.stdout:
+            print(line, end="")
+        returncode = proc.wait()
+        if returncode == 0:
             print(f"✅ {description} completed successfully")
             return True
         else:
-            print(f"❌ {description} failed: {result.stderr}")
+            print(f"❌ {description} failed with exit code {returncode}")
             return False
-    except subprocess.CalledProcessError as e:
+    except OSError as e:
         print(f"❌ {description} failed: {e}")
         return False
 
+def preload_model(repo_id):
+    """Download one HF model repo into the shared cache; a failure only affects this model"""
+    print(f"🔄 Pre-loading model: {repo_id}...")
+    try:
+        from huggingface_hub import snapshot_download
+        snapshot_download(repo_id=repo_id)
+        print(f"✅ Pre-loaded model: {repo_id}")
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not pre-load {repo_id}: {e}")
+        return False
+
 def setup_openvoice():
     """Set up OpenVoice with all required models"""
     
@@ -43,61 +63,63 @@ def setup_openvoice():
         "transformers>=4.21.0",
         "datasets",
         "accelerate",
-        "huggingface_hub"
+        "huggingface_hub",
+        "hf_transfer"
     ]
     
-    for package in packages:
-        run_command(f"pip install {package}", f"Installing {package}")
+    # One resolver run for everything, into the interpreter running this script; uv when available
+    installer = ["uv", "pip", "install", "--python", sys.executable] if shutil.which("uv") else [sys.executable, "-m", "pip", "install"]
+    run_command(installer + packages, "Installing OpenVoice dependencies")
     
     # 2. Create OpenVoice directory structure
     openvoice_dir = Path("openvoice")
-    openvoice_dir.mkdir(exist_ok=True)
-    
     checkpoints_dir = openvoice_dir / "checkpoints"
-    checkpoints_dir.mkdir(exist_ok=True)
+    checkpoints_dir.mkdir(parents=True, exist_ok=True)
     
-    # 3. Download OpenVoice models
+    # 3. Download OpenVoice code and models in one parallel, resumable snapshot
     print("📥 Downloading OpenVoice models...")
+    try:
+        from huggingface_hub import snapshot_download
+        snapshot_download(
+            repo_id="myshell-ai/OpenVoice",
+            repo_type="model",
+            allow_patterns=["*.py", "openvoice/**", "checkpoints/**"],
+            local_dir=str(openvoice_dir),
+            max_workers=8
+        )
+        print("✅ Downloaded OpenVoice snapshot")
+    except Exception as e:
+        print(f"❌ OpenVoice snapshot download failed: {e}")
     
-    # Download from HuggingFace
-    model_commands = [
-        "huggingface-cli download myshell-ai/OpenVoice checkpoints/base_speakers/EN --local-dir ./openvoice",
-        "huggingface-cli download myshell-ai/OpenVoice checkpoints/converter --local-dir ./openvoice", 
-        "huggingface-cli download myshell-ai/OpenVoice openvoice --local-dir ./openvoice"
-    ]
-    
-    for cmd in model_commands:
-        run_command(cmd, f"Downloading models: {cmd.split()[-1]}")
-    
-    # 4. Alternative: Clone OpenVoice repository
+    # 4. The Python sources only live on GitHub: fetch the latest tree, no history or old blobs
     if not (openvoice_dir / "api.py").exists():
-        print("📥 Cloning OpenVoice repository...")
-        run_command("git clone https://github.com/myshell-ai/OpenVoice.git temp_openvoice", "Cloning OpenVoice repo")
-        
-        # Copy necessary files
+        print("📥 Fetching OpenVoice sources...")
         temp_dir = Path("temp_openvoice")
+        run_command(
+            ["git", "clone", "--depth", "1", "--filter=blob:none", "--single-branch",
+             "https://github.com/myshell-ai/OpenVoice.git", str(temp_dir)],
+            "Cloning OpenVoice repo (shallow)"
+        )
+        
+        # Move (not copy) the needed files into place
         if temp_dir.exists():
             for file in temp_dir.glob("*.py"):
-                shutil.copy2(file, openvoice_dir)
+                shutil.move(str(file), str(openvoice_dir / file.name))
             
-            if (temp_dir / "openvoice").exists():
-                shutil.copytree(temp_dir / "openvoice", openvoice_dir / "openvoice", dirs_exist_ok=True)
+            if (temp_dir / "openvoice").exists() and not (openvoice_dir / "openvoice").exists():
+                shutil.move(str(temp_dir / "openvoice"), str(openvoice_dir / "openvoice"))
             
-            if (temp_dir / "checkpoints").exists():
-                shutil.copytree(temp_dir / "checkpoints", openvoice_dir / "checkpoints", dirs_exist_ok=True)
-            
-            # Clean up
+            # Only the shallow .git and unused files remain
             shutil.rmtree(temp_dir, ignore_errors=True)
     
     # 5. Create cache directories for offline operation
     cache_dirs = [
         openvoice_dir / "cache",
-        openvoice_dir / "hf_cache", 
         openvoice_dir / "torch_cache"
     ]
     
-    for cache_dir in cache_dirs:
-        cache_dir.mkdir(exist_ok=True)
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        list(ex.map(lambda d: d.mkdir(exist_ok=True), cache_dirs))
     
     # 6. Download additional models that might be needed
     additional_models = [
@@ -106,16 +128,14 @@ def setup_openvoice():
         "espnet/hindi_male_fgl"  # Hindi TTS model
     ]
     
-    for model in additional_models:
-        run_command(
-            f"python -c \"from transformers import pipeline; pipeline('automatic-speech-recognition', model='{model}')\"",
-            f"Pre-loading model: {model}",
-            check=False  # Don't fail if some models are not available
-        )
+    # Download only (no pipeline instantiation), in this process, all models at once;
+    # don't fail if some models are not available
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        list(ex.map(preload_model, additional_models))
     
     # 7. Create OpenVoice CLI wrapper
     cli_script = openvoice_dir / "openvoice_cli.py"
-    cli_script.write_text('''#!/usr/bin/env python3
+    atomic_write(cli_script, '''#!/usr/bin/env python3
 """
 OpenVoice CLI wrapper for voice cloning
 Usage: python openvoice_cli.py single -i input.wav -r reference.wav -o output.wav
@@ -173,31 +193,20 @@ if __name__ == "__main__":
 ''')
     
     # 8. Make CLI executable
-    run_command(f"chmod +x {cli_script}", "Making CLI executable", check=False)
+    run_command(["chmod", "+x", str(cli_script)], "Making CLI executable", check=False)
     
     # 9. Test the installation
     print("🧪 Testing OpenVoice installation...")
-    test_script = f'''
-import torch
-print(f"PyTorch version: {{torch.__version__}}")
-print(f"CUDA available: {{torch.cuda.is_available()}}")
-
-try:
-    import sys
-    sys.path.insert(0, "{openvoice_dir}")
-    from api import ToneColorConverter
-    print("✅ OpenVoice API import successful")
-except ImportError as e:
-    print(f"❌ OpenVoice API import failed: {{e}}")
-
-try:
-    from transformers import pipeline
-    print("✅ Transformers import successful")
-except ImportError as e:
-    print(f"❌ Transformers import failed: {{e}}")
-'''
+    # Packages were installed by this process, so refresh the import system's view first
+    importlib.invalidate_caches()
+    if try_import("torch"):
+        import torch
+        print(f"PyTorch version: {torch.__version__}")
+        print(f"CUDA available: {torch.cuda.is_available()}")
     
-    run_command(f'python -c "{test_script}"', "Testing installation", check=False)
+    sys.path.insert(0, str(openvoice_dir))
+    try_import("api")
+    try_import("transformers")
     
     print("🎉 OpenVoice setup completed!")
     print("\n📋 Next steps:")
@@ -223,8 +232,7 @@ ffmpeg-python>=0.2.0
 edge-tts>=6.1.0
 """
     
-    with open("requirements_openvoice.txt", "w") as f:
-        f.write(requirements)
+    atomic_write("requirements_openvoice.txt", requirements)
     
     print("✅ Created requirements_openvoice.txt for offline installation")
 
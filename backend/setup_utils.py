@@ -0,0 +1,23 @@
+"""
+Helpers shared by the setup / fix scripts in this folder
+"""
+
+import os
+
+def atomic_write(path, content):
+    """Write via a temp file and rename, so an interrupted run never leaves a truncated file"""
+    path = str(path)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+def try_import(name):
+    """Import a module in this process and report whether it loaded"""
+    try:
+        __import__(name)
+        print(f"✅ {name} imported")
+        return True
+    except Exception as e:
+        print(f"❌ {name} import failed: {e}")
+        return False
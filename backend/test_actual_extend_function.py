@@ -6,8 +6,13 @@ This script imports and tests the exact function used in the main script
 
 import os
 import sys
-import subprocess
+import io
 import tempfile
+import threading
+import wave
+import numpy as np
+import soundfile as sf
+from concurrent.futures import ThreadPoolExecutor
 
 # Add the current directory to Python path so we can import from generate.py
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -17,17 +22,100 @@ def create_test_audio(duration=1.5, filename="test_audio.wav"):
     print(f"📝 Creating test audio: {filename} ({duration}s)")
     
     try:
-        subprocess.run([
-            'ffmpeg', '-y', '-f', 'lavfi', 
-            '-i', f'sine=frequency=440:duration={duration}',
-            '-ar', '24000', '-ac', '1', filename
-        ], check=True, capture_output=True)
+        # 440 Hz mono tone at 24 kHz, synthesized in-process (no ffmpeg spawn)
+        t = np.arange(int(24000 * duration)) / 24000
+        sf.write(filename, (np.sin(2 * np.pi * 440 * t) * 0.5).astype(np.float32), 24000, subtype='PCM_16')
         
         return filename
     except Exception as e:
         print(f"❌ Failed to create test audio: {e}")
         return None
 
+def wav_duration(path):
+    """Duration of a PCM WAV from its header (no ffprobe)"""
+    with wave.open(path, 'rb') as w:
+        return w.getnframes() / w.getframerate()
+
+class _PerThreadStdout:
+    """sys.stdout stand-in: prints from a thread that set a buffer go there, everything else to the real stream"""
+    
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+    
+    def capture(self, buf):
+        self._local.buf = buf
+    
+    def release(self):
+        self._local.buf = None
+    
+    def write(self, text):
+        return (getattr(self._local, 'buf', None) or self._stream).write(text)
+    
+    def flush(self):
+        (getattr(self._local, 'buf', None) or self._stream).flush()
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+def _run_case(numbered_case):
+    """Run one case with its output (including extend_short_audio's) buffered; returns (passed, output)"""
+    buf = io.StringIO()
+    captured = isinstance(sys.stdout, _PerThreadStdout)
+    if captured:
+        sys.stdout.capture(buf)
+    try:
+        passed = _check_case(numbered_case)
+    finally:
+        if captured:
+            sys.stdout.release()
+    return passed, buf.getvalue()
+
+def _check_case(numbered_case):
+    """Create one test file in work_dir, extend it and check the result; returns True if the case passed"""
+    from generate import extend_short_audio
+    
+    i, (audio_duration, min_duration, description), work_dir = numbered_case
+    print(f"\n--- Test Case {i+1}: {description} ---")
+    
+    # Create test audio (extend_short_audio writes its _extended.wav next to it)
+    test_file = os.path.join(work_dir, f"test_case_{i+1}.wav")
+    if not create_test_audio(audio_duration, test_file):
+        print(f"❌ Failed to create test file for case {i+1}")
+        return False
+    
+    try:
+        print(f"🔄 Testing extend_short_audio({test_file}, {min_duration})")
+        
+        # Call the actual function
+        result = extend_short_audio(test_file, min_duration)
+        
+        if result:
+            print(f"✅ Function returned: {result}")
+            
+            # Verify the result file exists and has correct duration
+            if os.path.exists(result):
+                # Check duration
+                actual_duration = wav_duration(result)
+                print(f"📊 Actual output duration: {actual_duration:.2f}s")
+                
+                if actual_duration >= min_duration:
+                    print(f"✅ Test case {i+1} PASSED")
+                    return True
+                else:
+                    print(f"❌ Test case {i+1} FAILED: Duration too short")
+            else:
+                print(f"❌ Test case {i+1} FAILED: Output file doesn't exist")
+        else:
+            print(f"❌ Test case {i+1} FAILED: Function returned None/False")
+        return False
+        
+    except Exception as e:
+        print(f"❌ Test case {i+1} FAILED with exception: {e}")
+        import traceback
+        traceback.print_exc(file=sys.stdout)
+        return False
+
 def test_actual_extend_function():
     """Test the actual extend_short_audio function from generate.py"""
     print("🧪 TESTING ACTUAL EXTEND_SHORT_AUDIO FUNCTION")
@@ -46,65 +134,21 @@ def test_actual_extend_function():
             (4.0, 3.0, "Already long enough audio")
         ]
         
-        all_passed = True
+        # Cases are independent (own file names) and wait on ffmpeg, so run them side by side
+        # All test files live in one temp dir, removed in one go (no per-file cleanup, nothing left in CWD)
+        # Each case's prints are buffered and shown in case order afterwards, so they don't interleave
+        real_stdout = sys.stdout
+        sys.stdout = _PerThreadStdout(real_stdout)
+        try:
+            with tempfile.TemporaryDirectory() as work_dir, ThreadPoolExecutor(max_workers=len(test_cases)) as ex:
+                numbered_cases = [(i, case, work_dir) for i, case in enumerate(test_cases)]
+                results = list(ex.map(_run_case, numbered_cases))
+        finally:
+            sys.stdout = real_stdout
         
-        for i, (audio_duration, min_duration, description) in enumerate(test_cases):
-            print(f"\n--- Test Case {i+1}: {description} ---")
-            
-            # Create test audio
-            test_file = f"test_case_{i+1}.wav"
-            if not create_test_audio(audio_duration, test_file):
-                print(f"❌ Failed to create test file for case {i+1}")
-                all_passed = False
-                continue
-            
-            try:
-                print(f"🔄 Testing extend_short_audio({test_file}, {min_duration})")
-                
-                # Call the actual function
-                result = extend_short_audio(test_file, min_duration)
-                
-                if result:
-                    print(f"✅ Function returned: {result}")
-                    
-                    # Verify the result file exists and has correct duration
-                    if os.path.exists(result):
-                        # Check duration
-                        duration_result = subprocess.run([
-                            'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-                            '-of', 'csv=p=0', result
-                        ], capture_output=True, text=True, check=True)
-                        
-                        actual_duration = float(duration_result.stdout.strip())
-                        print(f"📊 Actual output duration: {actual_duration:.2f}s")
-                        
-                        if actual_duration >= min_duration:
-                            print(f"✅ Test case {i+1} PASSED")
-                        else:
-                            print(f"❌ Test case {i+1} FAILED: Duration too short")
-                            all_passed = False
-                    else:
-                        print(f"❌ Test case {i+1} FAILED: Output file doesn't exist")
-                        all_passed = False
-                else:
-                    print(f"❌ Test case {i+1} FAILED: Function returned None/False")
-                    all_passed = False
-                
-            except Exception as e:
-                print(f"❌ Test case {i+1} FAILED with exception: {e}")
-                import traceback
-                traceback.print_exc()
-                all_passed = False
-            
-            finally:
-                # Clean up test files
-                for pattern in [test_file, f"test_case_{i+1}_extended.wav"]:
-                    if os.path.exists(pattern):
-                        try:
-                            os.remove(pattern)
-                            print(f"🗑️ Cleaned up: {pattern}")
-                        except:
-                            pass
+        for _, output in results:
+            sys.stdout.write(output)
+        all_passed = all(passed for passed, _ in results)
         
         print(f"\n{'='*50}")
         if all_passed:
@@ -4,8 +4,43 @@ Test script to check OpenVoice model availability and configuration
 """
 
 import os
+import json
 import subprocess
 import sys
+import tempfile
+
+PROBE_CACHE = os.path.join(tempfile.gettempdir(), ".ov_model_probe.json")
+
+def list_cached_repos(hf_cache):
+    """Repo folders in <hf_cache>/hub; reuses the last scan while the hub folder's mtime is unchanged"""
+    hub = os.path.join(hf_cache, "hub")
+    if not os.path.isdir(hub):
+        return []
+    mtime = os.stat(hub).st_mtime
+    
+    try:
+        with open(PROBE_CACHE, encoding="utf-8") as f:
+            probe = json.load(f)
+        if probe["hub"] == hub and probe["mtime"] == mtime:
+            return probe["repos"]
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    with os.scandir(hub) as entries:
+        repos = [entry.path for entry in entries if entry.is_dir()]
+    
+    try:
+        tmp = PROBE_CACHE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"hub": hub, "mtime": mtime, "repos": repos}, f)
+        os.replace(tmp, PROBE_CACHE)
+    except OSError as e:
+        print(f"⚠️ Could not save cache probe: {e}")
+    return repos
+
+def find_cached_repos(hf_cache, pattern):
+    """Cached repo folders in <hf_cache>/hub whose name contains pattern (flat hub layout, no recursive walk)"""
+    return [repo for repo in list_cached_repos(hf_cache) if pattern.lower() in os.path.basename(repo).lower()]
 
 def check_openvoice_models():
     """Check if OpenVoice models are available"""
@@ -33,17 +68,16 @@ def check_openvoice_models():
         print(f"📁 HuggingFace cache found: {hf_cache}")
         
         # Look for WavMark models
-        import glob
-        wavmark_files = glob.glob(f"{hf_cache}/**/WavMark*", recursive=True)
+        wavmark_files = find_cached_repos(hf_cache, "WavMark")
         if wavmark_files:
-            print(f"✅ Found {len(wavmark_files)} WavMark model files")
+            print(f"✅ Found {len(wavmark_files)} WavMark model repos")
         else:
             print("⚠️ No WavMark models found in cache")
             
         # Look for OpenVoice models  
-        openvoice_files = glob.glob(f"{hf_cache}/**/open*voice*", recursive=True)
+        openvoice_files = find_cached_repos(hf_cache, "OpenVoice")
         if openvoice_files:
-            print(f"✅ Found {len(openvoice_files)} OpenVoice model files")
+            print(f"✅ Found {len(openvoice_files)} OpenVoice model repos")
         else:
             print("⚠️ No OpenVoice models found in cache")
             
@@ -1,71 +1,69 @@
-﻿import whisper
-import torch
+﻿import torch
 import re
 import os
-import time
-from pydub import AudioSegment
+import subprocess
+import numpy as np
+from functools import lru_cache
+from faster_whisper import WhisperModel
+import soundfile as sf
 from indic_transliteration.sanscript import transliterate, ITRANS, DEVANAGARI
-from difflib import get_close_matches
+from rapidfuzz import process, fuzz
 
-def normalize_word(w: str) -> str:
-    """Normalize a word by removing non-letters and lowering case."""
-    return re.sub(r'[^a-z]', '', w.lower())
+# Compiled once; these run per transcribed word
+_NORMALIZE_RE = re.compile(r'[^a-zA-Zअ-हक़-य़ء-ي]')
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+@lru_cache(maxsize=4)
+def _load_whisper(name: str, device: str):
+    # CTranslate2 weights: int8 on CPU, fp16 on GPU; on CPU use every core, not CTranslate2's default of 4 threads
+    compute_type = "int8" if device == "cpu" else "float16"
+    cpu_threads = os.cpu_count() or 0
+    print(f"📦 Loading Whisper model '{name}' on {device} ({compute_type})...")
+    return WhisperModel(name, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def get_whisper_model(name: str = "base", device: str = None):
+    """Load a Whisper model once per (name, device) and reuse it on later calls."""
+    # Resolve the default device first so implicit and explicit requests share one cached model
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    return _load_whisper(name, device)
 
 
 def convert_to_devanagari(text: str) -> str:
     """Convert Roman script to Devanagari using ITRANS transliteration."""
     return transliterate(text, ITRANS, DEVANAGARI)
 def _find_phrase_times(words_data, phrase_words):
-    match_index = 0
-    start_time = None
-    end_time = None
-
-    for word_info in words_data:
-        current_word = normalize_word(word_info["word"])
-        if current_word == phrase_words[match_index]:
-            if match_index == 0:
-                start_time = word_info["start"]
-            end_time = word_info["end"]
-            match_index += 1
-            if match_index == len(phrase_words):
-                break
-        else:
-            match_index = 0
-            start_time = None
-            end_time = None
-
-    return start_time, end_time
+    k = len(phrase_words)
+    if k == 0 or k > len(words_data):
+        return None, None
 
-def normalize_word(w):
-    return re.sub(r'[^a-zA-Zअ-हक़-य़ء-ي]', '', w.lower().strip())
+    words = np.array([normalize_word(w["word"]) for w in words_data])
+    starts = np.array([w["start"] for w in words_data])
+    ends = np.array([w["end"] for w in words_data])
 
-def trim_audio_by_word(audio_path: str, phrase: str, output_path: str = None):
-    """
-    Trims audio between the end of the first occurrence and start of the second
-    of the *first phonetically similar repeated word* (e.g., 'namaskar', 'nameskar').
-    """
+    # Window i matches when words[i + j] == phrase_words[j] for every j
+    n_windows = len(words) - k + 1
+    mask = np.ones(n_windows, dtype=bool)
+    for j, phrase_word in enumerate(phrase_words):
+        mask &= words[j:n_windows + j] == phrase_word
 
-    if output_path is None:
-        base_dir = "cloned_voices"
-        os.makedirs(base_dir, exist_ok=True)
-        timestamp = int(time.time() * 1000)
-        safe_phrase = re.sub(r'[^a-zA-Z0-9]', '_', phrase)
-        output_path = os.path.join(base_dir, f"{safe_phrase}_trimmed_{timestamp}.wav")
+    if not mask.any():
+        return None, None
+    first = int(np.argmax(mask))
+    return float(starts[first]), float(ends[first + k - 1])
 
-    print(f"🎧 Loading audio for trimming: {audio_path}")
-    model = whisper.load_model("base")
-    result = model.transcribe(audio_path, language="mr", word_timestamps=True)
-
-    all_words = []
-    for seg in result["segments"]:
-        all_words.extend(seg["words"])
-    
-    print("\n📝 Transcribed Words:")
-    for w in all_words:
-        print(f"{w['word']} ({w['start']:.2f}-{w['end']:.2f}s)")
+def normalize_word(w):
+    return _NORMALIZE_RE.sub('', w.lower().strip())
 
-    print("\n🔎 Searching for repeated similar words...")
-    normalized_words = [normalize_word(w["word"]) for w in all_words]
+def _copy_segment(audio_path: str, start: float, end: float, output_path: str):
+    """Cut [start, end] out of a WAV with ffmpeg stream copy (PCM is seeked and copied, never decoded)."""
+    subprocess.run([
+        'ffmpeg', '-y', '-i', audio_path,
+        '-ss', f'{start:.3f}', '-to', f'{end:.3f}',
+        '-c', 'copy', output_path
+    ], check=True, capture_output=True)
 
 def trim_audio_by_word(audio_path: str, target_name: str, output_path: str):
     """
@@ -75,13 +73,15 @@ def trim_audio_by_word(audio_path: str, target_name: str, output_path: str):
     3. Fall back to extracting a segment from the middle of the audio
     """
     print(f"🎧 Loading audio for trimming: {audio_path}")
-    model = whisper.load_model("base")
-    result = model.transcribe(audio_path, language="mr", word_timestamps=True)
+    model = get_whisper_model("base")
+    # segments is a lazy generator; materialize it once before walking the words
+    segments, _ = model.transcribe(audio_path, language="mr", word_timestamps=True)
+    segments = list(segments)
     all_words = []
     
-    for segment in result['segments']:
-        if 'words' in segment:
-            all_words.extend(segment['words'])
+    for segment in segments:
+        if segment.words:
+            all_words.extend({"word": w.word, "start": w.start, "end": w.end} for w in segment.words)
     
     print("📝 Transcribed Words:")
     for word_info in all_words:
@@ -91,25 +91,24 @@ def trim_audio_by_word(audio_path: str, target_name: str, output_path: str):
         raise ValueError("❌ No words found in transcription.")
     
     # Normalize words for comparison (remove punctuation, lowercase)
-    normalized_words = [re.sub(r'[^\w\s]', '', word["word"].lower().strip()) for word in all_words]
+    normalized_words = [_PUNCTUATION.sub('', word["word"].lower().strip()) for word in all_words]
     
     # Strategy 1: Try to find repeated similar words (original algorithm)
     print("🔎 Searching for repeated similar words...")
     for i, word1 in enumerate(normalized_words):
         if not word1:
             continue
-        matches = get_close_matches(word1, normalized_words[i+1:], n=1, cutoff=0.8)
+        # (match, score, index) tuples; the index locates the second word without a lookup
+        matches = process.extract(word1, normalized_words[i+1:], scorer=fuzz.ratio, score_cutoff=80, limit=1)
         if matches:
-            word2 = matches[0]
-            second_index = normalized_words.index(word2, i + 1)
+            word2, _, offset = matches[0]
+            second_index = i + 1 + offset
             print(f"✅ Found similar words: '{word1}' → '{word2}'")
             first_end = all_words[i]["end"]
             second_start = all_words[second_index]["start"]
 
             # Trim and export
-            audio = AudioSegment.from_file(audio_path)
-            trimmed = audio[int(first_end * 1000):int(second_start * 1000)]
-            trimmed.export(output_path, format="wav")
+            _copy_segment(audio_path, first_end, second_start, output_path)
 
             print(f"✂️ Trimmed audio between {first_end:.2f}s and {second_start:.2f}s → {output_path}")
             return output_path
@@ -118,44 +117,36 @@ def trim_audio_by_word(audio_path: str, target_name: str, output_path: str):
     print(f"🔎 Searching for words similar to '{target_name}'...")
     target_words = target_name.lower().split()
     for target_word in target_words:
-        matches = get_close_matches(target_word, normalized_words, n=3, cutoff=0.6)
+        matches = process.extract(target_word, normalized_words, scorer=fuzz.ratio, score_cutoff=60, limit=1)
         if matches:
-            # Find the first match in the audio
-            for match in matches:
-                try:
-                    match_index = normalized_words.index(match)
-                    word_start = all_words[match_index]["start"]
-                    word_end = all_words[match_index]["end"]
-                    
-                    # Extend the selection to include some context (0.5s before and after)
-                    buffer = 0.5
-                    trim_start = max(0, word_start - buffer)
-                    trim_end = word_end + buffer
-                    
-                    print(f"✅ Found similar word to '{target_word}': '{match}' at {word_start:.2f}-{word_end:.2f}s")
-                    
-                    # Trim and export
-                    audio = AudioSegment.from_file(audio_path)
-                    trimmed = audio[int(trim_start * 1000):int(trim_end * 1000)]
-                    trimmed.export(output_path, format="wav")
-                    
-                    print(f"✂️ Trimmed audio between {trim_start:.2f}s and {trim_end:.2f}s → {output_path}")
-                    return output_path
-                except ValueError:
-                    continue
+            # Best-scoring match; its index is where it occurs in the audio
+            match, _, match_index = matches[0]
+            word_start = all_words[match_index]["start"]
+            word_end = all_words[match_index]["end"]
+            
+            # Extend the selection to include some context (0.5s before and after)
+            buffer = 0.5
+            trim_start = max(0, word_start - buffer)
+            trim_end = word_end + buffer
+            
+            print(f"✅ Found similar word to '{target_word}': '{match}' at {word_start:.2f}-{word_end:.2f}s")
+            
+            # Trim and export
+            _copy_segment(audio_path, trim_start, trim_end, output_path)
+            
+            print(f"✂️ Trimmed audio between {trim_start:.2f}s and {trim_end:.2f}s → {output_path}")
+            return output_path
     
     # Strategy 3: Fallback - extract from the middle portion (assuming name is likely in the middle)
     print("🔄 Using fallback strategy: extracting middle segment...")
-    audio = AudioSegment.from_file(audio_path)
-    total_duration = len(audio) / 1000.0  # Duration in seconds
+    total_duration = sf.info(audio_path).duration  # Duration in seconds, from the header
     
     # Extract a 2-3 second segment from the middle
     segment_duration = min(3.0, total_duration * 0.4)  # 40% of audio or 3s max
     start_time = (total_duration - segment_duration) / 2
     end_time = start_time + segment_duration
     
-    trimmed = audio[int(start_time * 1000):int(end_time * 1000)]
-    trimmed.export(output_path, format="wav")
+    _copy_segment(audio_path, start_time, end_time, output_path)
     
     print(f"✂️ Fallback trim: extracted {segment_duration:.1f}s from middle ({start_time:.2f}s-{end_time:.2f}s) → {output_path}")
     return output_path
@@ -163,17 +154,17 @@ def trim_audio_by_word(audio_path: str, target_name: str, output_path: str):
 
 async def transcribe_audio(audio_path: str, language: str = "mr") -> str:
     """
-    Transcribes given audio using Whisper and returns the Devanagari script output.
+    Transcribes given audio using faster-whisper and returns the Devanagari script output.
     """
     try:
         print(f"📝 Transcribing audio: {audio_path} (language='{language}')")
         device = "cuda" if torch.cuda.is_available() else "cpu"
         print(f"🖥️  Using device: {device.upper()}")
 
-        model = whisper.load_model("small", device=device)
-        result = model.transcribe(audio_path, language=language, fp16=torch.cuda.is_available())
+        model = get_whisper_model("small", device)
+        segments, _ = model.transcribe(audio_path, language=language)
 
-        raw_text = result.get("text", "").strip()
+        raw_text = "".join(segment.text for segment in segments).strip()
         print(f"📜 Transcribed (Roman):\n{raw_text}")
 
         dev_text = convert_to_devanagari(raw_text)
@@ -8,18 +8,21 @@ import os
 import sys
 import subprocess
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import soundfile as sf
+
+BATCH_SIZE = 16  # short files extended per ffmpeg invocation
+
+def audio_duration(path: str) -> float:
+    """Duration in seconds read from the audio header in-process (no ffprobe)"""
+    return sf.info(path).duration
 
 def extend_audio_simple(input_path: str, output_path: str, target_duration: float = 5.0):
     """Simple audio extension using silence padding"""
     try:
         # Get current duration
-        result = subprocess.run([
-            'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-            '-of', 'csv=p=0', input_path
-        ], capture_output=True, text=True, check=True)
-        
-        current_duration = float(result.stdout.strip())
+        current_duration = audio_duration(input_path)
         print(f"Current duration: {current_duration:.2f}s, target: {target_duration:.2f}s")
         
         if current_duration >= target_duration:
@@ -34,9 +37,8 @@ def extend_audio_simple(input_path: str, output_path: str, target_duration: floa
         subprocess.run([
             'ffmpeg', '-y',
             '-i', input_path,
-            '-f', 'lavfi', '-t', str(silence_duration), '-i', 'anullsrc=channel_layout=mono:sample_rate=24000',
-            '-filter_complex', '[0:a][1:a]concat=n=2:v=0:a=1[out]',
-            '-map', '[out]',
+            '-af', f'apad=pad_dur={silence_duration}',
+            '-t', str(target_duration),
             output_path
         ], check=True, capture_output=True)
         
@@ -51,12 +53,7 @@ def extend_audio_repeat(input_path: str, output_path: str, target_duration: floa
     """Extend audio by repeating the content"""
     try:
         # Get current duration
-        result = subprocess.run([
-            'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-            '-of', 'csv=p=0', input_path
-        ], capture_output=True, text=True, check=True)
-        
-        current_duration = float(result.stdout.strip())
+        current_duration = audio_duration(input_path)
         
         if current_duration >= target_duration:
             if input_path != output_path:
@@ -82,6 +79,60 @@ def extend_audio_repeat(input_path: str, output_path: str, target_duration: floa
         print(f"❌ Audio repeat failed: {e}")
         return False
 
+def _fix_one(file_path: str):
+    """Check one WAV and extend it if it's short; returns (file_path, fixed)"""
+    file = os.path.basename(file_path)
+    try:
+        # Check duration
+        duration = audio_duration(file_path)
+        
+        if duration < 3.0:  # Less than 3 seconds
+            print(f"⚡ Found short audio: {file_path} ({duration:.2f}s)")
+            
+            # Create extended version
+            backup_path = file_path + ".original"
+            shutil.move(file_path, backup_path)
+            
+            # Try repeat method first, then silence padding
+            if extend_audio_repeat(backup_path, file_path, 5.0):
+                print(f"✅ Fixed with repeat: {file}")
+                return file_path, True
+            elif extend_audio_simple(backup_path, file_path, 5.0):
+                print(f"✅ Fixed with padding: {file}")
+                return file_path, True
+            else:
+                # Restore original if both methods fail
+                shutil.move(backup_path, file_path)
+                print(f"❌ Could not fix: {file}")
+                
+    except Exception as e:
+        print(f"⚠️ Could not process {file_path}: {e}")
+    return file_path, False
+
+def _fix_batch(file_paths):
+    """Loop a group of short WAVs to 5s in a single ffmpeg process; if that fails, fix them one at a time"""
+    pairs = [(file_path, file_path + ".original") for file_path in file_paths]
+    for file_path, backup_path in pairs:
+        shutil.move(file_path, backup_path)
+    
+    # One input per file, each mapped to its own output
+    args = ['ffmpeg', '-y']
+    for _, backup_path in pairs:
+        args += ['-stream_loop', '-1', '-i', backup_path]
+    for i, (file_path, _) in enumerate(pairs):
+        args += ['-map', f'{i}:a', '-t', '5.0', '-acodec', 'copy', file_path]
+    
+    try:
+        subprocess.run(args, check=True, capture_output=True)
+        for file_path, _ in pairs:
+            print(f"✅ Fixed with repeat: {os.path.basename(file_path)}")
+        return [(file_path, True) for file_path, _ in pairs]
+    except Exception as e:
+        print(f"⚠️ Batch extension failed ({e}), fixing files one at a time")
+        for file_path, backup_path in pairs:
+            os.replace(backup_path, file_path)
+        return [_fix_one(file_path) for file_path in file_paths]
+
 def fix_short_audio_files(directory: str = "."):
     """Find and fix short audio files in the directory"""
     print(f"🔍 Scanning for short audio files in: {directory}")
@@ -92,8 +143,8 @@ def fix_short_audio_files(directory: str = "."):
         "backend/tts", "backend/voice_reference", "backend/cloned_voices"
     ]
     
-    fixed_count = 0
-    
+    # Collect all WAV files first
+    paths = []
     for dir_name in dirs_to_check:
         dir_path = os.path.join(directory, dir_name)
         if not os.path.exists(dir_path):
@@ -105,39 +156,26 @@ def fix_short_audio_files(directory: str = "."):
         for root, dirs, files in os.walk(dir_path):
             for file in files:
                 if file.endswith('.wav'):
-                    file_path = os.path.join(root, file)
-                    
-                    try:
-                        # Check duration
-                        result = subprocess.run([
-                            'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-                            '-of', 'csv=p=0', file_path
-                        ], capture_output=True, text=True, check=True)
-                        
-                        duration = float(result.stdout.strip())
-                        
-                        if duration < 3.0:  # Less than 3 seconds
-                            print(f"⚡ Found short audio: {file_path} ({duration:.2f}s)")
-                            
-                            # Create extended version
-                            backup_path = file_path + ".original"
-                            shutil.move(file_path, backup_path)
-                            
-                            # Try repeat method first, then silence padding
-                            if extend_audio_repeat(backup_path, file_path, 5.0):
-                                print(f"✅ Fixed with repeat: {file}")
-                                fixed_count += 1
-                            elif extend_audio_simple(backup_path, file_path, 5.0):
-                                print(f"✅ Fixed with padding: {file}")
-                                fixed_count += 1
-                            else:
-                                # Restore original if both methods fail
-                                shutil.move(backup_path, file_path)
-                                print(f"❌ Could not fix: {file}")
-                                
-                    except Exception as e:
-                        print(f"⚠️ Could not process {file_path}: {e}")
+                    paths.append(os.path.join(root, file))
+    
+    # Durations come from the WAV headers, so find the short files up front
+    short_paths = []
+    for file_path in paths:
+        try:
+            duration = audio_duration(file_path)
+        except Exception as e:
+            print(f"⚠️ Could not process {file_path}: {e}")
+            continue
+        if duration < 3.0:  # Less than 3 seconds
+            print(f"⚡ Found short audio: {file_path} ({duration:.2f}s)")
+            short_paths.append(file_path)
+    
+    # One ffmpeg process per batch; workers mostly wait on ffmpeg, so run a few more than there are cores
+    batches = [short_paths[i:i + BATCH_SIZE] for i in range(0, len(short_paths), BATCH_SIZE)]
+    with ProcessPoolExecutor(max_workers=2 * (os.cpu_count() or 1)) as ex:
+        results = [result for batch in ex.map(_fix_batch, batches) for result in batch]
     
+    fixed_count = sum(1 for _, fixed in results if fixed)
     print(f"🎯 Fixed {fixed_count} short audio files")
 
 def main():
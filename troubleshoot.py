@@ -6,9 +6,38 @@ Run this to diagnose common issues with the voice cloning setup
 
 import os
 import sys
-import subprocess
-import importlib
-import platform
+import io
+import json
+import time
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+# Fixed for the whole run
+REQUIRED_MODULES = (
+    'numpy', 'pandas', 'pydub', 'moviepy', 'edge_tts',
+    'pyttsx3', 'openpyxl', 'aiofiles', 'fastapi', 'uvicorn',
+    'librosa', 'soundfile', 'scipy', 'torch', 'torchaudio',
+    'transformers', 'datasets', 'accelerate', 'huggingface_hub'
+)
+
+REQUIRED_FILES = (
+    'backend/generate.py',
+    'backend/generate_video.py',
+    'backend/word_trimming.py',
+    'backend/requirements.txt',
+    'README.md'
+)
+
+REQUIRED_DIRS = ('backend', 'backend/templates')
+
+INDICATORS = ('backend', 'README.md', '.git')
+
+AUDIO_DIRS = ("tts", "voice_reference", "cloned_voices", "backend/tts", "backend/voice_reference")
+
+# A clean run is remembered briefly so back-to-back runs (CI, dev loops) can skip every probe
+RESULT_CACHE = os.path.expanduser("~/.cache/voice_cloning_troubleshoot.json")
+RESULT_CACHE_TTL = 60  # seconds
 
 def check_python_version():
     """Check Python version"""
@@ -16,114 +45,155 @@ def check_python_version():
     print(f"🐍 Python Version: {version.major}.{version.minor}.{version.micro}")
     if version.major < 3 or (version.major == 3 and version.minor < 8):
         print("⚠️  WARNING: Python 3.8+ recommended")
-    else:
-        print("✅ Python version OK")
+        return False
+    print("✅ Python version OK")
+    return True
+
+def _module_present(module):
+    """True if the module can be found on sys.path (located, not imported)"""
+    # Already imported (e.g. by a host harness or an earlier run_basic_test): a dict lookup, no finder walk
+    if module in sys.modules:
+        return True
+    import importlib.util
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
 
 def check_required_modules():
     """Check if required Python modules are installed"""
-    required_modules = [
-        'numpy', 'pandas', 'pydub', 'moviepy', 'edge_tts', 
-        'pyttsx3', 'openpyxl', 'aiofiles', 'fastapi', 'uvicorn',
-        'librosa', 'soundfile', 'scipy', 'torch', 'torchaudio',
-        'transformers', 'datasets', 'accelerate', 'huggingface_hub'
-    ]
-    
     print("\n📦 Checking Python Modules:")
     missing_modules = []
     
-    for module in required_modules:
-        try:
-            importlib.import_module(module)
+    # find_spec only locates each module; importing torch & co. just to test presence takes seconds.
+    # Each probe is a chain of stat calls, so run them side by side; map keeps the print order.
+    with ThreadPoolExecutor(max_workers=min(32, len(REQUIRED_MODULES))) as ex:
+        present = list(ex.map(_module_present, REQUIRED_MODULES))
+    
+    for module, found in zip(REQUIRED_MODULES, present):
+        if found:
             print(f"✅ {module}")
-        except ImportError:
+        else:
             print(f"❌ {module} - MISSING")
             missing_modules.append(module)
     
     if missing_modules:
         print(f"\n⚠️  Missing modules: {', '.join(missing_modules)}")
         print("💡 Install with: pip install -r backend/requirements.txt")
-    else:
-        print("✅ All required modules found")
+        return False
+    print("✅ All required modules found")
+    return True
 
-def check_ffmpeg():
-    """Check if FFmpeg is available"""
+def check_ffmpeg(verbose=False):
+    """Check if FFmpeg is available (PATH lookup; runs ffmpeg -version only when verbose)"""
     print("\n🎵 Checking FFmpeg:")
+    import shutil
+    ffmpeg_path = shutil.which('ffmpeg')
+    if ffmpeg_path is None:
+        print("❌ FFmpeg not found in PATH")
+        print("💡 Install FFmpeg and add to PATH")
+        return False
+    print(f"✅ ffmpeg at {ffmpeg_path}")
+    if not verbose:
+        return True
+    
+    import subprocess
     try:
-        result = subprocess.run(['ffmpeg', '-version'], 
+        result = subprocess.run([ffmpeg_path, '-version'], 
                               capture_output=True, text=True, timeout=5)
         if result.returncode == 0:
             version_line = result.stdout.split('\n')[0]
             print(f"✅ {version_line}")
-        else:
-            print("❌ FFmpeg found but returned error")
-    except FileNotFoundError:
-        print("❌ FFmpeg not found in PATH")
-        print("💡 Install FFmpeg and add to PATH")
+            return True
+        print("❌ FFmpeg found but returned error")
     except subprocess.TimeoutExpired:
         print("⚠️  FFmpeg check timed out")
     except Exception as e:
         print(f"❌ FFmpeg check failed: {e}")
+    return False
+
+# The checks below probe overlapping paths (backend, backend/templates, as.mp4);
+# the tree doesn't change during a run, so each path is listed or stat()ed once
+@lru_cache(maxsize=256)
+def _list_dir(path):
+    """Names in a directory from a single scandir (None if it can't be read)"""
+    try:
+        with os.scandir(path) as entries:
+            return frozenset(entry.name for entry in entries)
+    except OSError:
+        return None
+
+@lru_cache(maxsize=256)
+def _isdir(path):
+    return os.path.isdir(path)
+
+@lru_cache(maxsize=256)
+def _isfile(path):
+    return os.path.isfile(path)
 
 def check_file_structure():
     """Check if required files and directories exist"""
     print("\n📁 Checking File Structure:")
     
-    required_files = [
-        'backend/generate.py',
-        'backend/generate_video.py', 
-        'backend/word_trimming.py',
-        'backend/requirements.txt',
-        'README.md'
-    ]
+    all_ok = True
     
-    required_dirs = [
-        'backend',
-        'backend/templates'
-    ]
-    
-    # Check files
-    for file_path in required_files:
-        if os.path.exists(file_path):
+    # Check files: list each parent directory once and test names against it
+    listings = {}
+    for file_path in REQUIRED_FILES:
+        parent = os.path.dirname(file_path) or '.'
+        if parent not in listings:
+            listings[parent] = _list_dir(parent)
+        names = listings[parent]
+        found = os.path.basename(file_path) in names if names is not None else _isfile(file_path)
+        if found:
             print(f"✅ {file_path}")
         else:
             print(f"❌ {file_path} - MISSING")
+            all_ok = False
     
     # Check directories
-    for dir_path in required_dirs:
-        if os.path.exists(dir_path) and os.path.isdir(dir_path):
+    for dir_path in REQUIRED_DIRS:
+        if _isdir(dir_path):
             print(f"✅ {dir_path}/")
         else:
             print(f"❌ {dir_path}/ - MISSING")
+            all_ok = False
     
     # Check template videos
     templates_dir = 'backend/templates'
-    if os.path.exists(templates_dir):
-        video_files = [f for f in os.listdir(templates_dir) if f.endswith('.mp4')]
+    template_names = _list_dir(templates_dir)
+    if template_names is not None:
+        video_files = sorted(f for f in template_names if f.endswith('.mp4'))
         if video_files:
             print(f"✅ Template videos: {', '.join(video_files)}")
         else:
             print("⚠️  No .mp4 template videos found")
+            all_ok = False
+    return all_ok
 
 def check_working_directory():
     """Check if running from correct directory"""
     print(f"\n📍 Current Directory: {os.getcwd()}")
     
     # Check if we're in the right place
-    indicators = ['backend', 'README.md', '.git']
-    found_indicators = [item for item in indicators if os.path.exists(item)]
+    cwd_names = _list_dir('.') or frozenset()
+    found_indicators = [item for item in INDICATORS if item in cwd_names]
     
     if len(found_indicators) >= 2:
         print("✅ Appears to be in correct project directory")
-    else:
-        print("⚠️  May not be in correct project directory")
-        print("💡 Make sure you're in the Voice-Cloning project root")
+        return True
+    print("⚠️  May not be in correct project directory")
+    print("💡 Make sure you're in the Voice-Cloning project root")
+    return False
 
 def check_system_info():
     """Display system information"""
     print(f"\n💻 System Info:")
+    import platform
     print(f"   OS: {platform.system()} {platform.release()}")
     print(f"   Architecture: {platform.machine()}")
     print(f"   Processor: {platform.processor()}")
+    return True  # informational only
 
 def run_basic_test():
     """Run a basic test of the voice cloning system"""
@@ -137,50 +207,86 @@ def run_basic_test():
         
         # Check if template video exists
         template_path = "backend/templates/as.mp4"
-        if os.path.exists(template_path):
+        template_names = _list_dir(os.path.dirname(template_path))
+        if template_names is not None and os.path.basename(template_path) in template_names:
             print("✅ Template video found")
             print("💡 Try running: python backend/generate.py \"Test Name\" \"backend/templates/as.mp4\"")
-        else:
-            print("❌ Template video not found")
+            return True
+        print("❌ Template video not found")
             
     except Exception as e:
         print(f"❌ Cannot import generate.py: {e}")
+    return False
+
+def _audio_duration(file_path):
+    """Duration in seconds from the WAV header (soundfile, in-process); ffprobe only if that can't read it"""
+    try:
+        import soundfile as sf
+        return sf.info(file_path).duration
+    except Exception:
+        # soundfile missing (this script also diagnoses that) or a file libsndfile can't parse
+        import subprocess
+        result = subprocess.run([
+            'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
+            '-of', 'csv=p=0', file_path
+        ], capture_output=True, text=True, check=True)
+        return float(result.stdout.strip())
+
+def _try_audio_duration(file_path):
+    """(duration, None) on success, (None, error) otherwise, so one bad file doesn't abort the batch"""
+    try:
+        return _audio_duration(file_path), None
+    except Exception as e:
+        return None, e
 
 def check_audio_lengths():
     """Check for short audio files that might cause OpenVoice issues"""
     print("\n🎵 Checking Audio File Lengths:")
     
-    audio_dirs = ["tts", "voice_reference", "cloned_voices", "backend/tts", "backend/voice_reference"]
     short_files = []
+    unreadable = 0
     
-    for audio_dir in audio_dirs:
-        if not os.path.exists(audio_dir):
+    # Collect every WAV first, then read the durations concurrently (each is independent, I/O-bound)
+    wav_dirs = []
+    for audio_dir in AUDIO_DIRS:
+        if not _isdir(audio_dir):
             continue
-            
+        
+        # Iterative scandir walk: DirEntry types come from the directory read, no extra stat per entry
+        wav_paths = []
+        stack = [audio_dir]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.endswith('.wav'):
+                            wav_paths.append(entry.path)
+            except OSError as e:
+                print(f"⚠️  Could not read directory: {e}")
+                unreadable += 1
+        wav_dirs.append((audio_dir, wav_paths))
+    
+    all_paths = [file_path for _, wav_paths in wav_dirs for file_path in wav_paths]
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        results = iter(list(ex.map(_try_audio_duration, all_paths)))
+    
+    # Report per directory, in the order the files were found
+    for audio_dir, wav_paths in wav_dirs:
         print(f"📂 Checking: {audio_dir}")
         
-        for root, dirs, files in os.walk(audio_dir):
-            for file in files:
-                if file.endswith('.wav'):
-                    file_path = os.path.join(root, file)
-                    
-                    try:
-                        # Get audio duration using FFmpeg
-                        result = subprocess.run([
-                            'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-                            '-of', 'csv=p=0', file_path
-                        ], capture_output=True, text=True, check=True)
-                        
-                        duration = float(result.stdout.strip())
-                        
-                        if duration < 3.0:  # Less than 3 seconds
-                            short_files.append((file_path, duration))
-                            print(f"⚠️  Short audio: {file} ({duration:.2f}s)")
-                        else:
-                            print(f"✅ {file} ({duration:.2f}s)")
-                            
-                    except Exception as e:
-                        print(f"❌ Could not check {file}: {e}")
+        for file_path in wav_paths:
+            file = os.path.basename(file_path)
+            duration, error = next(results)
+            if error is not None:
+                print(f"❌ Could not check {file}: {error}")
+                unreadable += 1
+            elif duration < 3.0:  # Less than 3 seconds
+                short_files.append((file_path, duration))
+                print(f"⚠️  Short audio: {file} ({duration:.2f}s)")
+            else:
+                print(f"✅ {file} ({duration:.2f}s)")
     
     if short_files:
         print(f"\n⚠️  Found {len(short_files)} short audio files")
@@ -188,21 +294,13 @@ def check_audio_lengths():
         print("💡 Run: python fix_short_audio.py to fix them")
     else:
         print("✅ No problematically short audio files found")
+    return not short_files and not unreadable
 
-def main():
-    """Main troubleshooting function"""
+def _print_header():
     print("🔧 Voice Cloning Troubleshooting Tool")
     print("=" * 50)
-    
-    check_python_version()
-    check_system_info()
-    check_working_directory()
-    check_file_structure()
-    check_ffmpeg()
-    check_required_modules()
-    run_basic_test()
-    check_audio_lengths()
-    
+
+def _print_summary():
     print("\n" + "=" * 50)
     print("🎯 Troubleshooting Complete!")
     print("\n💡 Common Solutions:")
@@ -214,5 +312,86 @@ def main():
     print("   6. Fix short audio files: python fix_short_audio.py")
     print("   7. For OpenVoice 'too short' errors, audio files will be auto-extended")
 
+def _run_section(section, buffered=True):
+    """Run one section with its prints buffered, then emit them in a single write; returns the section's result"""
+    if not buffered:
+        result = section()
+        sys.stdout.flush()
+        return result
+    
+    buf = io.StringIO()
+    try:
+        with redirect_stdout(buf):
+            result = section()
+    finally:
+        sys.stdout.write(buf.getvalue())
+        sys.stdout.flush()
+    return result
+
+def _result_cache_key(include_audio_check):
+    """Same project dir, interpreter and requirements.txt version; None if there's nothing to key on"""
+    try:
+        requirements_mtime = os.stat('backend/requirements.txt').st_mtime_ns
+    except OSError:
+        return None
+    return f"{os.getcwd()}|{sys.executable}|{requirements_mtime}|{int(include_audio_check)}"
+
+def _load_result_cache():
+    try:
+        with open(RESULT_CACHE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_result(key, all_ok):
+    """Record this run's outcome (temp file + rename, so a concurrent run never reads half a file)"""
+    cache = _load_result_cache()
+    cache[key] = {"all_ok": all_ok, "time": time.time()}
+    try:
+        os.makedirs(os.path.dirname(RESULT_CACHE), exist_ok=True)
+        tmp = RESULT_CACHE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp, RESULT_CACHE)
+    except OSError as e:
+        print(f"⚠️  Could not save troubleshooting result: {e}")
+
+def main(include_audio_check=True, verbose=False, use_cache=True):
+    """Main troubleshooting function (include_audio_check=False skips the audio length scan, verbose adds ffmpeg -version)"""
+    # Verbose asks for fresh details, so it always runs the checks
+    key = _result_cache_key(include_audio_check) if use_cache and not verbose else None
+    if key is not None:
+        entry = _load_result_cache().get(key)
+        if entry and entry.get("all_ok"):
+            age = time.time() - entry.get("time", 0)
+            if 0 <= age < RESULT_CACHE_TTL:
+                _print_header()
+                print(f"✅ All checks passed {age:.0f}s ago with this setup (cached)")
+                print("💡 Run with --no-cache to check again")
+                return
+    
+    # Each check returns True when it found nothing to fix
+    checks = [
+        check_python_version,
+        check_system_info,
+        check_working_directory,
+        check_file_structure,
+        lambda: check_ffmpeg(verbose),
+        check_required_modules,
+        run_basic_test
+    ]
+    if include_audio_check:
+        checks.append(check_audio_lengths)
+    
+    # One write per section instead of one per line; output still appears section by section.
+    # run_basic_test imports generate, which rewraps sys.stdout.buffer at import time (a StringIO has none),
+    # so that section writes straight to the real stdout
+    _run_section(_print_header)
+    results = [_run_section(check, buffered=check is not run_basic_test) for check in checks]
+    _run_section(_print_summary)
+    
+    if key is not None:
+        _save_result(key, all(results))
+
 if __name__ == "__main__":
-    main()
+    main(verbose="--verbose" in sys.argv[1:], use_cache="--no-cache" not in sys.argv[1:])